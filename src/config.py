@@ -5,4 +5,28 @@ load_dotenv()
 
 TOGETHER_API_KEY = os.getenv("API")
 
+# Адрес API (можно направить на локальный стенд: python -m utils.mock_server)
+API_BASE = os.getenv("API_BASE", "https://api.together.xyz/v1")
+
+# Предзагрузка структур рефератов во время ввода тем (PREFETCH=1 - включена по умолчанию)
+PREFETCH_ENABLED = os.getenv("PREFETCH", "0") == "1"
+
+# Каталог с данными программы (очередь заданий и т.п.)
+DATA_DIR = os.getenv("REFERATOR_DATA", os.path.join(os.path.expanduser("~"), ".referator"))
+
+# Сколько заданий генерируется одновременно
+WORKERS = int(os.getenv("WORKERS", "2"))
+
+# Ограничение запросов к API в минуту на всё приложение (0 - без ограничения)
+RATE_LIMIT_RPM = int(os.getenv("RATE_LIMIT_RPM", "0"))
+
+# Трассировка этапов генерации в DATA_DIR/traces (открывать в ui.perfetto.dev или chrome://tracing)
+TRACE_ENABLED = os.getenv("TRACE", "0") == "1"
+
+# Цена модели за миллион токенов, $ (Llama-3-70b на together.ai)
+PRICE_PER_MTOKEN = float(os.getenv("PRICE_PER_MTOKEN", "0.88"))
+
+# Лимит расходов за время работы программы, $ (0 - без ограничения)
+SPEND_LIMIT = float(os.getenv("SPEND_LIMIT", "0"))
+
 print(TOGETHER_API_KEY)
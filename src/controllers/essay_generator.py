@@ -1,51 +1,255 @@
-from typing import List
+from typing import Dict, List, Optional
 import os
-from PySide6.QtCore import QObject, Signal, QThread
-from models import Essay, Section, APIClient
+import threading
+import time
+from PySide6.QtCore import QObject, Signal, Slot, QThread, Qt
+from models import Essay, Section, APIClient, BatchClient, CostPlanner, SpendGovernor
 from models.api_client import APIError
-from utils import DocumentFormatter
+from models.batch_client import BatchCancelled
+from models.throughput import ThroughputModel, INTRODUCTION_SYMBOLS, job_work
+from models.cost import STRUCTURE_LINE_SYMBOLS
+from utils import DocumentFormatter, EssayArchive
+from utils.archive_writer import safe_filename, claim_filename
+from utils import tracing
+from controllers.prefetcher import StructurePrefetcher
+from controllers.job_queue import Job, JobQueue, JobStatus
+from config import DATA_DIR, WORKERS, TRACE_ENABLED
+
+GENERIC_ERROR_MESSAGE = (
+    "Что-то пошло не так... 😔\n\n"
+    "Возможные причины:\n"
+    "• Слишком сложная тема\n"
+    "• Временные проблемы с сервисом\n"
+    "• Проблемы с подключением\n\n"
+    "Попробуйте упростить тему или повторить попытку позже."
+)
 
 class GeneratorWorker(QThread):
+    bulk = False  # Запросы идут по цене пакетных заданий
     progress = Signal(int)
     status = Signal(str)
     finished = Signal(bool, str)
     essay_completed = Signal(str)  # Сигнал о готовом реферате
+    essay_failed = Signal(str)  # Реферат по теме не получился, остальные продолжают генерироваться
+    section_text = Signal(str, str, str)  # тема, раздел, очередной кусок текста ("" - раздел генерируется заново)
     
-    def __init__(self, topics: List[str], num_chapters: int, symbols_per_chapter: int, output_path: str, language: str = "Русский"):
+    def __init__(self, topics: List[str], num_chapters: int, symbols_per_chapter: int, output_path: str, language: str = "Русский", api_client: Optional[APIClient] = None, throughput: Optional[ThroughputModel] = None):
         super().__init__()
         self.topics = topics
         self.num_chapters = num_chapters
         self.symbols_per_chapter = symbols_per_chapter
         self.output_path = output_path
         self.language = language
-        self.api_client = APIClient()
+        self.api_client = api_client or APIClient()
         self.formatter = DocumentFormatter()
         self.stop_generation = False
+        self.job_id = None
+        # Получать текст разделов по мере генерации (для предпросмотра)
+        self.stream_sections = False
+        # Складывать рефераты в один ZIP-архив вместо отдельных файлов
+        self.archive_mode = False
+        self.archive = None
+        self.failed_topics: List[str] = []
+        # Трассировка этапов: общий трассировщик запуска, подпись задания и время постановки в очередь
+        self.tracer = None
+        self.trace_name = ""
+        self.queued_at = None
+        self._trace_started = None
+        # Лимит расходов: оценка резервируется перед каждым рефератом (api_client.spend_governor)
+        self.planner = CostPlanner(self.api_client)
+        self.deferred = False  # Генерация остановлена лимитом, оставшиеся темы отложены
+        # Модель скорости и оставшийся объём работы - для оценки времени до конца
+        self.throughput = throughput
+        self.remaining_requests, self.remaining_symbols = job_work(len(topics), num_chapters, symbols_per_chapter)
+        # Снятое событие означает паузу: поток ждёт его перед следующим запросом
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+
+    def pause(self) -> None:
+        """Ставит генерацию на паузу перед следующим запросом"""
+        self._resume_event.clear()
+
+    def resume(self) -> None:
+        """Продолжает генерацию после паузы"""
+        self._resume_event.set()
+
+    def _wait_if_paused(self) -> None:
+        """Ждёт снятия паузы"""
+        if not self._resume_event.is_set():
+            with tracing.span("paused"):
+                self._resume_event.wait()
+
+    def _reserve_budget(self, topics: List[str]) -> bool:
+        """Резервирует оценку стоимости тем в лимите расходов; False - если они не укладываются"""
+        governor = self.api_client.spend_governor
+        if governor is None:
+            return True
+        cost = self.planner.estimate(topics, self.num_chapters, self.symbols_per_chapter, self.language, self.bulk).cost
+        return governor.try_reserve(cost)
+
+    def _release_budget(self) -> None:
+        """Снимает остаток резерва потока: фактические расходы уже учтены по usage"""
+        if self.api_client.spend_governor is not None:
+            self.api_client.spend_governor.release()
+
+    def _defer(self, remaining: int) -> None:
+        """Останавливает генерацию до лимита расходов, оставляя темы на потом"""
+        self.deferred = True
+        message = (
+            "Достигнут лимит расходов. 💸\n\n"
+            f"Начатые рефераты дописаны, оставшиеся темы ({remaining}) отложены.\n"
+            "Увеличьте лимит или пополните баланс и продолжите задание."
+        )
+        self.status.emit(message)
+        self.finished.emit(False, message)
+
+    def _job_label(self) -> str:
+        """Подпись задания в аргументах интервалов трассы"""
+        return self.trace_name or (self.topics[0] if self.topics else "")
+
+    def _start_tracing(self) -> None:
+        """Включает трассировку в потоке worker'а и отмечает время ожидания в очереди"""
+        # Потоки пула в режиме сервиса выполняют разные задания - задание указывается в интервалах, а не в имени потока
+        tracing.activate(self.tracer, threading.current_thread().name)
+        if self.tracer is None:
+            return
+        self._trace_started = time.time_ns() // 1000
+        if self.queued_at is not None:
+            queued_us = int(self.queued_at * 1_000_000)
+            self.tracer.add("queue_wait", queued_us, self._trace_started - queued_us,
+                            job=self._job_label(), topics=len(self.topics))
+
+    def _stop_tracing(self) -> None:
+        """Записывает интервал всего задания и выключает трассировку потока"""
+        if self.tracer is not None and self._trace_started is not None:
+            self.tracer.add("job", self._trace_started, time.time_ns() // 1000 - self._trace_started,
+                            job=self._job_label(), topics=len(self.topics))
+            self._trace_started = None
+        tracing.activate(None)
+
+    def cancel(self) -> None:
+        """Отменяет генерацию (в том числе стоящую на паузе)"""
+        self.stop_generation = True
+        self._resume_event.set()
+        
+    def _section_symbols(self, title: str) -> int:
+        """Сколько символов запрашивается для раздела"""
+        return INTRODUCTION_SYMBOLS if "Введение" in title else self.symbols_per_chapter
+
+    def _record_request(self, started: float, symbols: int) -> None:
+        """Учитывает выполненный запрос в модели скорости и в оставшемся объёме работы"""
+        requests_made, wait = self.api_client.take_call_stats()
+        # Структура из кэша предзагрузки не ходила в сеть - время такого "запроса" ничего не говорит
+        if self.throughput and requests_made:
+            self.throughput.record(time.monotonic() - started - wait, symbols, wait)
+        self.remaining_requests = max(self.remaining_requests - 1, 0)
+        self.remaining_symbols = max(self.remaining_symbols - symbols, 0)
+
+    def _parse_structure(self, structure: str) -> List[str]:
+        """Разбирает ответ со структурой на заголовки разделов"""
+        return [line.strip() for line in structure.split('\n') if line.strip()]
+
+    def _build_section(self, title: str, content: str) -> Section:
+        """Создает раздел реферата"""
+        is_chapter = "Глава" in title
+        return Section(title=title, content=content, is_chapter=is_chapter)
+
+    def _open_archive(self) -> None:
+        """Создает архив запуска, если включён режим архива"""
+        if self.archive_mode:
+            # Архивы, начатые в одну секунду, получают разные имена
+            name = claim_filename(self.output_path, time.strftime("Рефераты - %Y-%m-%d %H-%M-%S.zip"))
+            path = os.path.join(self.output_path, name)
+            try:
+                self.archive = EssayArchive(path, {
+                    "num_chapters": self.num_chapters,
+                    "symbols_per_chapter": self.symbols_per_chapter,
+                    "language": self.language,
+                })
+            except Exception:
+                os.remove(path)
+                raise
+
+    def _close_archive(self) -> None:
+        """Дописывает манифест и закрывает архив"""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def _save_essay(self, topic: str, sections: List[Section], metrics: Optional[dict] = None) -> None:
+        """Проверяет реферат, форматирует и сохраняет его в .docx (или в архив)"""
+        # Создаем объект реферата
+        essay = Essay(
+            topic=topic,
+            sections=sections,
+            num_chapters=self.num_chapters,
+            symbols_per_chapter=self.symbols_per_chapter
+        )
+        
+        # Проверяем корректность структуры
+        if not essay.validate():
+            raise Exception(f"Некорректная структура реферата для темы: {topic}")
+        
+        # Создаем и сохраняем документ
+        doc = self.formatter.create_document(essay)
         
+        if self.archive is not None:
+            with tracing.span("archive_add"):
+                self.archive.add(essay, doc, metrics)
+            return
+
+        # Формируем имя файла и путь: не перезаписываем ни темы, совпавшие после очистки,
+        # ни файлы, сохранённые в этой папке другими воркерами, заданиями или прошлым запуском
+        filename = claim_filename(self.output_path, safe_filename(topic))
+        full_path = os.path.join(self.output_path, filename)
+        
+        # Сохраняем документ поверх занятого пустого файла; при ошибке имя освобождается
+        with tracing.span("doc_save"):
+            try:
+                doc.save(full_path)
+            except Exception:
+                os.remove(full_path)
+                raise
+
     def run(self):
         try:
             total_steps = len(self.topics) * (self.num_chapters + 1)  # +1 для введения
             current_step = 0
+            self.api_client.take_call_stats()  # сбрасываем статистику потока
+            self._start_tracing()
+            self._open_archive()
             
-            for topic in self.topics:
+            for index, topic in enumerate(self.topics):
+                self._wait_if_paused()
                 if self.stop_generation:
                     self.status.emit("Генерация отменена")
                     self.finished.emit(False, "Генерация была отменена пользователем")
                     return
 
+                # Реферат начинается, только если его оценка укладывается в лимит расходов
+                self._release_budget()
+                if not self._reserve_budget([topic]):
+                    self._defer(len(self.topics) - index)
+                    return
+
                 self.status.emit(f"Генерация структуры реферата: {topic}")
+                topic_started = time.monotonic()
                 
                 # Получаем структуру реферата
-                structure = self.api_client.get_essay_structure(topic, self.num_chapters, self.language)
+                started = time.monotonic()
+                with tracing.span("structure", topic=topic):
+                    structure = self.api_client.get_essay_structure(topic, self.num_chapters, self.language)
+                self._record_request(started, 0)
                 if not structure:
                     raise Exception(f"Не удалось получить структуру для темы: {topic}")
                 
                 # Разбираем структуру на секции
-                section_titles = [line.strip() for line in structure.split('\n') if line.strip()]
+                section_titles = self._parse_structure(structure)
                 sections = []
                 
                 # Генерируем содержимое для каждой секции
                 for title in section_titles:
+                    self._wait_if_paused()
                     if self.stop_generation:
                         self.status.emit("Генерация отменена")
                         self.finished.emit(False, "Генерация была отменена пользователем")
@@ -53,86 +257,417 @@ class GeneratorWorker(QThread):
 
                     self.status.emit(f"Генерация раздела: {title}")
                     
-                    content = self.api_client.generate_section_content(
-                        topic, 
-                        title,
-                        self.symbols_per_chapter,
-                        self.language
-                    )
+                    started = time.monotonic()
+                    on_chunk = None
+                    if self.stream_sections:
+                        on_chunk = lambda text, topic=topic, title=title: self.section_text.emit(topic, title, text)
+                    with tracing.span("section", topic=topic, title=title):
+                        content = self.api_client.generate_section_content(
+                            topic, 
+                            title,
+                            self.symbols_per_chapter,
+                            self.language,
+                            on_chunk
+                        )
+                    self._record_request(started, self._section_symbols(title))
                     
                     if not content:
                         raise Exception(f"Не удалось сгенерировать содержимое для раздела: {title}")
                     
-                    is_chapter = "Глава" in title
-                    sections.append(Section(title=title, content=content, is_chapter=is_chapter))
+                    sections.append(self._build_section(title, content))
                     
                     current_step += 1
                     progress = (current_step * 100) // total_steps
                     self.progress.emit(progress)
                 
-                # Создаем объект реферата
-                essay = Essay(
-                    topic=topic,
-                    sections=sections,
-                    num_chapters=self.num_chapters,
-                    symbols_per_chapter=self.symbols_per_chapter
-                )
-                
-                # Проверяем корректность структуры
-                if not essay.validate():
-                    raise Exception(f"Некорректная структура реферата для темы: {topic}")
-                
-                # Создаем и сохраняем документ
-                doc = self.formatter.create_document(essay)
-                
-                # Формируем имя файла и путь
-                safe_filename = "".join(x for x in topic if x.isalnum() or x in (' ', '-', '_')).strip()
-                safe_filename = f"Реферат - {safe_filename}.docx"
-                full_path = os.path.join(self.output_path, safe_filename)
-                
-                # Сохраняем документ
-                doc.save(full_path)
+                with tracing.span("save_essay", topic=topic):
+                    self._save_essay(topic, sections, {
+                        "seconds": round(time.monotonic() - topic_started, 1),
+                        "requests": len(sections) + 1,
+                        "symbols": sum(len(section.content) for section in sections),
+                    })
                 
                 # Сигнализируем о готовом реферате
                 self.essay_completed.emit(topic)
             
+            self._close_archive()
             self.finished.emit(True, "Рефераты успешно сгенерированы! 🎉")
             
         except APIError as e:
-            self.status.emit(e.user_message)
-            self.finished.emit(False, e.user_message)
+            self._fail(e.user_message)
         except Exception as e:
-            error_message = (
-                "Что-то пошло не так... 😔\n\n"
-                "Возможные причины:\n"
-                "• Слишком сложная тема\n"
-                "• Временные проблемы с сервисом\n"
-                "• Проблемы с подключением\n\n"
-                "Попробуйте упростить тему или повторить попытку позже."
+            self._fail(GENERIC_ERROR_MESSAGE)
+        finally:
+            self._close_archive()
+            self._release_budget()
+            self._stop_tracing()
+
+    def _fail(self, message: str) -> None:
+        """Сообщает об ошибке генерации"""
+        self.status.emit(message)
+        self.finished.emit(False, message)
+
+    def _fail_topic(self, topic: str, reason: str) -> None:
+        """Отмечает реферат как несгенерированный, не прерывая остальные"""
+        self.failed_topics.append(topic)
+        if self.archive is not None:
+            self.archive.add_failed(topic, reason)
+        self.status.emit(f"Реферат не сохранён: {reason}")
+        self.essay_failed.emit(topic)
+
+class BatchGeneratorWorker(GeneratorWorker):
+    """Пакетный режим: все промпты уходят одним batch-заданием - дольше, но дешевле и без 429"""
+
+    bulk = True
+
+    BATCH_STATUSES = {
+        "VALIDATING": "проверка задания",
+        "IN_PROGRESS": "задание выполняется",
+        "FINALIZING": "сбор результатов",
+    }
+
+    def __init__(self, *args, poll_interval: int = 30, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_client = BatchClient(self.api_client, poll_interval)
+
+    def _reserve_fallback(self, prompts: List[str], completion_symbols: int) -> None:
+        """Доплата за ответы, которые пакетное задание не вернуло: обычный запрос дороже пакетного"""
+        governor = self.api_client.spend_governor
+        if governor is None or not prompts:
+            return
+        extra = 0.0
+        for prompt in prompts:
+            extra += self.planner.estimate_request(prompt, completion_symbols, self.language).cost
+            extra -= self.planner.estimate_request(prompt, completion_symbols, self.language, bulk=True).cost
+        # Без этих ответов не сохранить уже оплаченные рефераты - запрашиваем их даже сверх лимита
+        if not governor.try_reserve(extra):
+            self.status.emit(
+                f"Лимит расходов может быть превышен примерно на ${extra:.4f}: "
+                f"{len(prompts)} ответов дозапрашиваются по обычной цене"
             )
-            self.status.emit(error_message)
-            self.finished.emit(False, error_message)
+
+    def _run_batch(self, stage: str, prompts: Dict[str, str], completion_symbols: int) -> Dict[str, str]:
+        """Выполняет пакетное задание; недостающие ответы дозапрашивает обычными запросами"""
+        self.status.emit(f"{stage}: отправка пакетного задания ({len(prompts)} запросов)")
+        results = self.batch_client.run(
+            prompts,
+            on_status=lambda status: self.status.emit(
+                f"{stage}: {self.BATCH_STATUSES.get(status, status.lower())}"
+            ),
+            should_stop=lambda: self.stop_generation
+        )
+        self._wait_if_paused()
+        self._reserve_fallback(
+            [prompt for custom_id, prompt in prompts.items() if not results.get(custom_id)],
+            completion_symbols
+        )
+        for custom_id, prompt in prompts.items():
+            if not results.get(custom_id):
+                if self.stop_generation:
+                    raise BatchCancelled()
+                results[custom_id] = self.api_client.make_request(prompt)
+        return results
+
+    def run(self):
+        try:
+            self._start_tracing()
+
+            # В задание попадают только темы, укладывающиеся в лимит расходов
+            total_topics = len(self.topics)
+            allowed = 0
+            while allowed < total_topics and self._reserve_budget([self.topics[allowed]]):
+                allowed += 1
+            if allowed == 0:
+                self._defer(total_topics)
+                return
+            topics = self.topics[:allowed]
+
+            # Прогресс считается по всем темам worker'а: отложенные остаются несделанными
+            def report(value: int) -> None:
+                self.progress.emit(value * allowed // total_topics)
+
+            # Этап 1: структуры всех рефератов одним заданием
+            structure_prompts = {
+                f"structure-{i}": self.api_client.structure_prompt(topic, self.num_chapters, self.language)
+                for i, topic in enumerate(topics)
+            }
+            structures = self._run_batch("Структуры рефератов", structure_prompts,
+                                         (self.num_chapters + 1) * STRUCTURE_LINE_SYMBOLS)
+            report(10)
+
+            # Этап 2: содержимое всех разделов всех рефератов одним заданием
+            titles = {}
+            section_prompts = {}
+            for i, topic in enumerate(topics):
+                structure = structures.get(f"structure-{i}")
+                if not structure:
+                    raise Exception(f"Не удалось получить структуру для темы: {topic}")
+                titles[i] = self._parse_structure(structure)
+                for j, title in enumerate(titles[i]):
+                    section_prompts[f"section-{i}-{j}"] = self.api_client.section_prompt(
+                        topic, title, self.symbols_per_chapter, self.language
+                    )
+            self._wait_if_paused()
+            contents = self._run_batch("Разделы рефератов", section_prompts,
+                                       max(self.symbols_per_chapter, INTRODUCTION_SYMBOLS))
+            report(90)
+
+            # Этап 3: раскладываем ответы по рефератам и сохраняем документы
+            self._open_archive()
+            for i, topic in enumerate(topics):
+                # Все ответы уже оплачены: ошибка в одном реферате не должна выбрасывать остальные
+                try:
+                    sections = []
+                    for j, title in enumerate(titles.pop(i)):
+                        # Забираем ответ из общего словаря, чтобы сохранённые рефераты не держали память
+                        content = contents.pop(f"section-{i}-{j}", None)
+                        if not content:
+                            raise Exception(f"Не удалось сгенерировать содержимое для раздела: {title}")
+                        sections.append(self._build_section(title, content))
+
+                    with tracing.span("save_essay", topic=topic):
+                        self._save_essay(topic, sections, {
+                            "requests": len(sections) + 1,
+                            "symbols": sum(len(section.content) for section in sections),
+                        })
+                except Exception as error:
+                    self._fail_topic(topic, str(error))
+                else:
+                    self.essay_completed.emit(topic)
+                report(90 + ((i + 1) * 10) // len(topics))
+
+            self._close_archive()
+            if allowed < total_topics:
+                self._defer(total_topics - allowed)
+                return
+            if len(self.failed_topics) == len(topics):
+                self._fail(GENERIC_ERROR_MESSAGE)
+            elif self.failed_topics:
+                self.finished.emit(True, (
+                    f"Рефераты сгенерированы, кроме {len(self.failed_topics)} тем: "
+                    + "; ".join(self.failed_topics)
+                ))
+            else:
+                self.finished.emit(True, "Рефераты успешно сгенерированы! 🎉")
+
+        except BatchCancelled:
+            self.status.emit("Генерация отменена")
+            self.finished.emit(False, "Генерация была отменена пользователем")
+        except APIError as e:
+            self._fail(e.user_message)
+        except Exception:
+            self._fail(GENERIC_ERROR_MESSAGE)
+        finally:
+            self._close_archive()
+            self._release_budget()
+            self._stop_tracing()
 
 class EssayGeneratorController(QObject):
     progress = Signal(int)
     status = Signal(str)
     finished = Signal(bool, str)
     essay_completed = Signal(str)  # Прокидываем сигнал дальше
+    # Куски текста разделов приходят из потоков worker'ов напрямую (DirectConnection):
+    # получатель должен быть потокобезопасным и сам решать, когда обновлять интерфейс
+    section_text = Signal(str, str, str)
+    job_updated = Signal(str)  # id задания, у которого изменились статус или прогресс
+    # осталось секунд (-1 - неизвестно), символов в секунду, есть ли ещё пакетные задания с непредсказуемым временем
+    eta = Signal(int, float, bool)
     
-    def __init__(self):
+    def __init__(self, max_workers: int = WORKERS):
         super().__init__()
-        self.worker = None
+        # Один клиент на всё приложение: общее соединение и кэш структур
+        self.api_client = APIClient()
+        self.prefetcher = StructurePrefetcher(self.api_client)
+        # Очередь заданий переживает перезапуск программы
+        self.queue = JobQueue(os.path.join(DATA_DIR, "jobs.json"))
+        self.max_workers = max_workers
+        self.workers: Dict[str, GeneratorWorker] = {}
+        self.throughput = ThroughputModel(os.path.join(DATA_DIR, "throughput.json"))
+        # Оценка стоимости до запуска и общий для всех заданий лимит расходов
+        self.planner = CostPlanner(self.api_client)
+        self.governor = SpendGovernor()
+        self.api_client.spend_governor = self.governor
+        self.preview_enabled = False
+        # Трасса пишется с момента, когда очередь начала работу, до момента, когда она опустела
+        self.tracer = None
+
+    def warm_up(self) -> None:
+        """Прогревает соединение с API в фоне"""
+        self.prefetcher.warm_up()
+
+    def prefetch_structures(self, topics: List[str], num_chapters: int, language: str = "Русский") -> None:
+        """Спекулятивно запрашивает структуры для уже введённых тем"""
+        self.prefetcher.prefetch(topics, num_chapters, language)
     
-    def generate_essays(self, topics: List[str], num_chapters: int, symbols_per_chapter: int, output_path: str, language: str = "Русский") -> None:
-        """Генерирует рефераты для списка тем"""
-        # Создаем и настраиваем worker
-        self.worker = GeneratorWorker(topics, num_chapters, symbols_per_chapter, output_path, language)
+    def estimate_cost(self, topics: List[str], num_chapters: int, symbols_per_chapter: int, language: str = "Русский", bulk: bool = False):
+        """Оценка токенов и стоимости списка тем до отправки запросов"""
+        return self.planner.estimate(topics, num_chapters, symbols_per_chapter, language, bulk)
+
+    def set_spend_limit(self, limit: float) -> None:
+        """Меняет лимит расходов (0 - без ограничения)"""
+        self.governor.limit = limit
+
+    def generate_essays(self, topics: List[str], num_chapters: int, symbols_per_chapter: int, output_path: str, language: str = "Русский", bulk: bool = False, priority: int = 0, archive: bool = False) -> str:
+        """Ставит генерацию рефератов для списка тем в очередь (bulk - через пакетное задание, archive - в один ZIP)"""
+        job = self.queue.submit(Job(
+            topics=topics,
+            num_chapters=num_chapters,
+            symbols_per_chapter=symbols_per_chapter,
+            output_path=output_path,
+            language=language,
+            bulk=bulk,
+            priority=priority,
+            archive=archive
+        ))
+        # Кэш предзагрузки держит только структуры тем, которые ещё предстоит сгенерировать
+        self.prefetcher.reset({
+            (topic, queued.num_chapters, queued.language)
+            for queued in self.queue.jobs() if queued.status not in JobStatus.FINAL
+            for topic in queued.remaining_topics
+        })
+        self.job_updated.emit(job.id)
+        self.start_queue()
+        return job.id
+
+    def start_queue(self) -> None:
+        """Запускает задания из очереди, пока есть свободные потоки"""
+        while len(self.workers) < self.max_workers:
+            job = self.queue.next_pending()
+            if job is None:
+                break
+            self._start_worker(job)
+
+    def _start_worker(self, job: Job) -> None:
+        """Создает worker для задания и запускает его"""
+        worker_class = BatchGeneratorWorker if job.bulk else GeneratorWorker
+        worker = worker_class(job.remaining_topics, job.num_chapters, job.symbols_per_chapter,
+                              job.output_path, job.language, self.api_client, self.throughput)
+        worker.job_id = job.id
+        worker.stream_sections = self.preview_enabled
+        worker.archive_mode = job.archive
+        if TRACE_ENABLED:
+            if self.tracer is None:
+                self.tracer = tracing.Tracer()
+            worker.tracer = self.tracer
+            worker.trace_name = job.title
+            worker.queued_at = job.queued_at
         
         # Подключаем сигналы
-        self.worker.progress.connect(self.progress.emit)
-        self.worker.status.connect(self.status.emit)
-        self.worker.finished.connect(self.finished.emit)
-        self.worker.essay_completed.connect(self.essay_completed.emit)
+        worker.progress.connect(self._on_worker_progress)
+        worker.status.connect(self.status.emit)
+        worker.finished.connect(self._on_worker_finished)
+        worker.essay_completed.connect(self._on_essay_completed)
+        worker.essay_failed.connect(self._on_essay_failed)
+        worker.section_text.connect(self.section_text, Qt.ConnectionType.DirectConnection)
+
+        self.workers[job.id] = worker
+        self.job_updated.emit(job.id)
         
         # Запускаем генерацию в отдельном потоке
-        self.worker.start() 
\ No newline at end of file
+        worker.start()
+
+    def _emit_total_progress(self) -> None:
+        """Общий прогресс по всем незавершённым заданиям"""
+        active = [job for job in self.queue.jobs() if job.status not in JobStatus.FINAL]
+        if active:
+            self.progress.emit(sum(job.progress for job in active) // len(active))
+
+    def _emit_eta(self) -> None:
+        """Оценка оставшегося времени по всем активным и ожидающим заданиям"""
+        active = [job for job in self.queue.jobs() if job.status in (JobStatus.PENDING, JobStatus.RUNNING)]
+        if not active:
+            return
+        # Пакетное задание выполняется сервисом часами - его время не предсказать,
+        # но оценку обычных заданий оно не отменяет
+        jobs = [job for job in active if not job.bulk]
+        bulk_pending = len(jobs) < len(active)
+        if not jobs:
+            self.eta.emit(-1, 0.0, bulk_pending)
+            return
+
+        requests = symbols = 0
+        for job in jobs:
+            if job.id in self.workers:
+                worker = self.workers[job.id]
+                requests += worker.remaining_requests
+                symbols += worker.remaining_symbols
+            else:
+                job_requests, job_symbols = job_work(len(job.remaining_topics), job.num_chapters, job.symbols_per_chapter)
+                requests += job_requests
+                symbols += job_symbols
+
+        seconds = self.throughput.estimate(
+            requests, symbols,
+            concurrency=min(self.max_workers, len(jobs)),
+            min_interval=self.api_client.min_interval
+        )
+        self.eta.emit(int(seconds), symbols / seconds if seconds > 0 else 0.0, bulk_pending)
+
+    @Slot(int)
+    def _on_worker_progress(self, value: int):
+        worker = self.sender()
+        job = self.queue.get(worker.job_id)
+        # worker считает прогресс только по оставшимся темам
+        self.queue.update(job.id, progress=job.overall_progress(len(worker.topics), value))
+        self.job_updated.emit(job.id)
+        self._emit_total_progress()
+        self._emit_eta()
+
+    @Slot(str)
+    def _on_essay_completed(self, topic: str):
+        worker = self.sender()
+        job = self.queue.get(worker.job_id)
+        self.queue.update(job.id, completed_topics=job.completed_topics + [topic])
+        self.essay_completed.emit(topic)
+
+    @Slot(str)
+    def _on_essay_failed(self, topic: str):
+        worker = self.sender()
+        job = self.queue.get(worker.job_id)
+        self.queue.update(job.id, failed_topics=job.failed_topics + [topic])
+        self.job_updated.emit(job.id)
+
+    @Slot(bool, str)
+    def _on_worker_finished(self, success: bool, message: str):
+        worker = self.sender()
+        job = self.queue.finish(worker.job_id, success, message, worker.deferred)
+
+        # Сигнал приходит из run() перед его возвратом - дожидаемся фактического завершения потока
+        self.workers.pop(job.id, None)
+        worker.wait()
+        self.throughput.save()
+
+        self.job_updated.emit(job.id)
+        self.finished.emit(success, message)
+        self.start_queue()
+
+        if not self.workers and self.tracer is not None:
+            self.tracer.export(tracing.trace_path(os.path.join(DATA_DIR, "traces")))
+            self.tracer = None
+
+    def pause_job(self, job_id: str) -> None:
+        """Ставит задание на паузу"""
+        if self.queue.pause(job_id, self.workers.get(job_id)):
+            self.job_updated.emit(job_id)
+
+    def resume_job(self, job_id: str) -> None:
+        """Возобновляет задание с паузы"""
+        if self.queue.resume(job_id, self.workers.get(job_id)):
+            self.start_queue()
+            self.job_updated.emit(job_id)
+
+    def cancel_job(self, job_id: str) -> None:
+        """Отменяет задание"""
+        if self.queue.cancel(job_id, self.workers.get(job_id)):
+            self.job_updated.emit(job_id)
+
+    def cancel_all(self) -> None:
+        """Отменяет все незавершённые задания"""
+        for job in self.queue.jobs():
+            self.cancel_job(job.id)
+
+    def clear_finished(self) -> None:
+        """Убирает завершённые задания из очереди"""
+        self.queue.clear_finished()
+        self.job_updated.emit("")
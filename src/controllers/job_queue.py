@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+
+class JobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINAL = (DONE, FAILED, CANCELLED)
+
+    NAMES = {
+        PENDING: "В очереди",
+        RUNNING: "Генерируется",
+        PAUSED: "На паузе",
+        DONE: "Готово",
+        FAILED: "Ошибка",
+        CANCELLED: "Отменено",
+    }
+
+
+@dataclass
+class Job:
+    topics: List[str]
+    num_chapters: int
+    symbols_per_chapter: int
+    output_path: str
+    language: str = "Русский"
+    bulk: bool = False
+    priority: int = 0
+    archive: bool = False
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    status: str = JobStatus.PENDING
+    progress: int = 0
+    completed_topics: List[str] = field(default_factory=list)
+    failed_topics: List[str] = field(default_factory=list)
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    queued_at: float = field(default_factory=time.time)  # когда задание последний раз встало в очередь
+
+    @property
+    def remaining_topics(self) -> List[str]:
+        """Темы, которые ещё не обработаны (темы обрабатываются по порядку)"""
+        return self.topics[len(self.completed_topics) + len(self.failed_topics):]
+
+    def overall_progress(self, worker_topics: int, value: int) -> int:
+        """Прогресс всего задания по прогрессу worker'а, которому достались последние worker_topics тем"""
+        total = len(self.topics)
+        done_before = total - worker_topics
+        return (done_before * 100 + value * worker_topics) // total
+
+    @property
+    def title(self) -> str:
+        """Краткое описание задания для списка"""
+        if len(self.topics) == 1:
+            return self.topics[0]
+        return f"{self.topics[0]} (+{len(self.topics) - 1})"
+
+
+class JobQueue:
+    """Очередь заданий с приоритетами, сохраняемая на диск после каждого изменения"""
+
+    # Поля, которые меняются на каждом шаге генерации: хранятся только в памяти,
+    # на диск попадают вместе со следующим существенным изменением
+    VOLATILE_FIELDS = {"progress"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self._jobs = {}
+        self._load()
+
+    def _load(self):
+        """Загружает задания, оставшиеся с прошлого запуска"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        for item in data:
+            job = Job(**item)
+            # Задание прервано закрытием программы - ждёт, пока его возобновят
+            if job.status == JobStatus.RUNNING:
+                job.status = JobStatus.PAUSED
+                job.message = "Прервано при закрытии программы"
+            elif job.status == JobStatus.PENDING:
+                job.queued_at = time.time()
+            self._jobs[job.id] = job
+
+    def _save(self):
+        """Атомарно записывает очередь на диск (вызывается под self.lock)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([asdict(job) for job in self._jobs.values()], f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def submit(self, job: Job) -> Job:
+        """Добавляет задание в очередь"""
+        with self.lock:
+            self._jobs[job.id] = job
+            self._save()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Все задания в порядке добавления"""
+        with self.lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def next_pending(self) -> Optional[Job]:
+        """Берёт задание с наибольшим приоритетом (при равенстве - самое старое) и помечает его запущенным"""
+        with self.lock:
+            pending = [job for job in self._jobs.values() if job.status == JobStatus.PENDING]
+            if not pending:
+                return None
+            job = min(pending, key=lambda job: (-job.priority, job.created_at))
+            job.status = JobStatus.RUNNING
+            job.message = ""
+            self._save()
+            return job
+
+    def update(self, job_id: str, **fields) -> Optional[Job]:
+        """Обновляет поля задания и сохраняет очередь"""
+        with self.lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            for name, value in fields.items():
+                setattr(job, name, value)
+            # Ожидание в очереди отсчитывается заново при каждом возврате задания в очередь
+            if fields.get("status") == JobStatus.PENDING:
+                job.queued_at = time.time()
+            if not fields.keys() <= self.VOLATILE_FIELDS:
+                self._save()
+            return job
+
+    # Переходы статусов общие для окна программы и режима сервиса;
+    # worker - запущенный worker задания (None, если задание ещё ждёт в очереди)
+
+    def pause(self, job_id: str, worker=None) -> bool:
+        """Ставит задание на паузу; False - если его статус этого не допускает"""
+        job = self.get(job_id)
+        if job is None or job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return False
+        if worker is not None:
+            worker.pause()
+        self.update(job_id, status=JobStatus.PAUSED)
+        return True
+
+    def resume(self, job_id: str, worker=None) -> bool:
+        """Возобновляет задание с паузы; без worker'а оно возвращается в очередь"""
+        job = self.get(job_id)
+        if job is None or job.status != JobStatus.PAUSED:
+            return False
+        if worker is not None:
+            self.update(job_id, status=JobStatus.RUNNING)
+            worker.resume()
+        else:
+            # Задание ещё не запускалось, было отложено или прервано закрытием программы
+            self.update(job_id, status=JobStatus.PENDING, message="")
+        return True
+
+    def cancel(self, job_id: str, worker=None) -> bool:
+        """Отменяет незавершённое задание"""
+        job = self.get(job_id)
+        if job is None or job.status in JobStatus.FINAL:
+            return False
+        self.update(job_id, status=JobStatus.CANCELLED)
+        if worker is not None:
+            worker.cancel()
+        return True
+
+    def finish(self, job_id: str, success: bool, message: str, deferred: bool = False) -> Optional[Job]:
+        """Итоговый статус задания после завершения его worker'а"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if success:
+            return self.update(job_id, status=JobStatus.DONE, progress=100, message=message)
+        if deferred:
+            # Отложенное лимитом задание остаётся в очереди и продолжается с первой несделанной темы
+            return self.update(job_id, status=JobStatus.PAUSED, message=message)
+        if job.status == JobStatus.CANCELLED:
+            return self.update(job_id, message=message)
+        return self.update(job_id, status=JobStatus.FAILED, message=message)
+
+    def clear_finished(self) -> None:
+        """Удаляет завершённые задания"""
+        with self.lock:
+            self._jobs = {job_id: job for job_id, job in self._jobs.items()
+                          if job.status not in JobStatus.FINAL}
+            self._save()
@@ -0,0 +1,80 @@
+import queue
+import threading
+from typing import List, Set, Tuple
+from models import APIClient, CostPlanner
+
+_WARM_UP = object()
+
+
+class StructurePrefetcher:
+    """Фоновая предзагрузка структур рефератов, пока пользователь вводит темы"""
+
+    def __init__(self, api_client: APIClient, max_topics: int = 20):
+        self.api_client = api_client
+        self.planner = CostPlanner(api_client)
+        self.max_topics = max_topics
+        self.tasks = queue.Queue()
+        self.requested: Set[Tuple[str, int, str]] = set()
+        self.thread = None
+
+    def _ensure_started(self):
+        """Запускает фоновый поток при первой задаче"""
+        if self.thread is None:
+            # daemon - чтобы незавершённый спекулятивный запрос не держал закрытие программы
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def warm_up(self) -> None:
+        """Ставит в очередь прогрев соединения"""
+        self._ensure_started()
+        self.tasks.put(_WARM_UP)
+
+    def prefetch(self, topics: List[str], num_chapters: int, language: str) -> None:
+        """Ставит в очередь предзагрузку структур для новых тем (не больше max_topics)"""
+        for topic in topics:
+            key = (topic, num_chapters, language)
+            if key in self.requested:
+                continue
+            if len(self.requested) >= self.max_topics:
+                break
+            self.requested.add(key)
+            self._ensure_started()
+            self.tasks.put(key)
+
+    def reset(self, keep: Set[Tuple[str, int, str]]) -> None:
+        """Сбрасывает предзагрузку после запуска генерации: keep - структуры, которые ещё понадобятся"""
+        self.requested.clear()
+        # Ещё не начатые предзагрузки снимаем: темы задания генерация запросит сама,
+        # а параллельный спекулятивный запрос той же структуры был бы оплачен дважды
+        warm_ups = 0
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is _WARM_UP:
+                warm_ups += 1
+        for _ in range(warm_ups):
+            self.tasks.put(_WARM_UP)
+        self.api_client.retain_structures(keep)
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            if task is _WARM_UP:
+                self.api_client.warm_up()
+            else:
+                self._prefetch(*task)
+
+    def _prefetch(self, topic: str, num_chapters: int, language: str) -> None:
+        """Предзагружает структуру, только если её стоимость укладывается в лимит расходов"""
+        governor = self.api_client.spend_governor
+        if governor is not None:
+            cost = self.planner.estimate_structure(topic, num_chapters, language).cost
+            if not governor.try_reserve(cost):
+                return
+        try:
+            self.api_client.prefetch_structure(topic, num_chapters, language)
+        finally:
+            if governor is not None:
+                governor.release()
@@ -1,5 +1,7 @@
 from .essay import Essay, Section
 from .api_client import APIClient
+from .batch_client import BatchClient
+from .cost import CostPlanner, SpendGovernor
 
-__all__ = ['Essay', 'Section', 'APIClient'] 
+__all__ = ['Essay', 'Section', 'APIClient', 'BatchClient', 'CostPlanner', 'SpendGovernor'] 
 
@@ -1,8 +1,10 @@
 import requests
 import json
 import time
-from typing import Optional
-from config import TOGETHER_API_KEY
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+from config import TOGETHER_API_KEY, API_BASE, RATE_LIMIT_RPM
+from utils import tracing
 
 
 class APIError(Exception):
@@ -71,20 +73,69 @@ class APIResponseError(APIError):
 
 
 class APIClient:
-    def __init__(self, base_delay: int = 5, max_retries: int = 3):
+    def __init__(self, base_delay: int = 5, max_retries: int = 3, requests_per_minute: int = RATE_LIMIT_RPM):
         self.base_delay = base_delay
         self.max_retries = max_retries
+        # Ограничение частоты запросов общее для всех потоков, использующих клиент (0 - без ограничения)
+        self.min_interval = 60 / requests_per_minute if requests_per_minute > 0 else 0
+        self._next_request_at = 0.0
+        self._rate_lock = threading.Lock()
+        # Статистика текущего потока: число HTTP-запросов и время ожидания (backoff, лимит)
+        self._call_stats = threading.local()
+        # Учёт фактических расходов по usage из ответов (models.cost.SpendGovernor)
+        self.spend_governor = None
         self.api_key = TOGETHER_API_KEY
-        self.base_url = "https://api.together.xyz/v1/chat/completions"
+        self.api_base = API_BASE
+        self.base_url = f"{self.api_base}/chat/completions"
         self.model = "meta-llama/Llama-3-70b-chat-hf"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        # Общая сессия держит TCP/TLS-соединение открытым между запросами
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Кэш заранее полученных структур: (тема, главы, язык) -> структура
+        self._structure_cache: Dict[Tuple[str, int, str], str] = {}
+        self._structure_pending: Dict[Tuple[str, int, str], threading.Event] = {}
+        # Структуры, которые генерация уже забрала или запросила сама - их предзагрузка была бы лишней
+        self._structure_consumed: Set[Tuple[str, int, str]] = set()
+        self._structure_lock = threading.Lock()
 
-    def make_request(self, prompt: str, attempt: int = 0) -> Optional[str]:
-        """Выполняет запрос к Together.ai с повторными попытками"""
-        data = {
+    def warm_up(self) -> None:
+        """Заранее устанавливает соединение с сервером (DNS, TCP, TLS)"""
+        try:
+            self.session.head(self.api_base, timeout=10)
+        except requests.exceptions.RequestException:
+            pass
+
+    def _throttle(self) -> None:
+        """Ждёт своей очереди, чтобы не превысить лимит запросов в минуту"""
+        if not self.min_interval:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + self.min_interval
+        if start_at > now:
+            self._sleep(start_at - now, "rate_limit_wait")
+
+    def _sleep(self, seconds: float, reason: str = "retry_sleep") -> None:
+        """Ожидание, которое учитывается в статистике потока"""
+        self._call_stats.wait = getattr(self._call_stats, "wait", 0.0) + seconds
+        with tracing.span(reason, seconds=round(seconds, 3)):
+            time.sleep(seconds)
+
+    def take_call_stats(self) -> Tuple[int, float]:
+        """Запросы и время ожидания текущего потока с прошлого вызова (и сброс счётчиков)"""
+        stats = (getattr(self._call_stats, "requests", 0), getattr(self._call_stats, "wait", 0.0))
+        self._call_stats.requests = 0
+        self._call_stats.wait = 0.0
+        return stats
+
+    def build_payload(self, prompt: str) -> dict:
+        """Формирует тело запроса chat/completions"""
+        return {
             "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
@@ -94,16 +145,33 @@ class APIClient:
             "top_p": 0.9,
         }
 
+    def make_request(self, prompt: str, attempt: int = 0, on_chunk: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Выполняет запрос к Together.ai с повторными попытками (on_chunk - получать текст по мере генерации)
+
+        Перед повтором оборванного потокового ответа on_chunk получает пустую строку:
+        ответ начнётся заново, и уже показанный текст нужно сбросить.
+        """
+        data = self.build_payload(prompt)
+        if on_chunk:
+            data["stream"] = True
+
         try:
-            response = requests.post(
-                url=self.base_url,
-                headers=self.headers,
-                data=json.dumps(data),
-                timeout=30
-            )
+            self._throttle()
+            self._call_stats.requests = getattr(self._call_stats, "requests", 0) + 1
+            with tracing.span("http_request", attempt=attempt, stream=on_chunk is not None):
+                response = self.session.post(
+                    url=self.base_url,
+                    data=json.dumps(data),
+                    timeout=30,
+                    stream=on_chunk is not None
+                )
 
             if response.status_code == 200:
+                if on_chunk:
+                    return self._read_stream(response, on_chunk)
                 result = response.json()
+                if self.spend_governor is not None:
+                    self.spend_governor.record_usage(result.get('usage'))
                 if 'choices' in result and len(result['choices']) > 0:
                     return result['choices'][0]['message']['content']
                 else:
@@ -112,8 +180,8 @@ class APIClient:
             elif response.status_code == 429:
                 if attempt < self.max_retries:
                     delay = self.base_delay * (2 ** attempt)
-                    time.sleep(delay)
-                    return self.make_request(prompt, attempt + 1)
+                    self._sleep(delay)
+                    return self.make_request(prompt, attempt + 1, on_chunk)
                 raise RateLimitError()
 
             else:
@@ -122,20 +190,100 @@ class APIClient:
         except requests.exceptions.RequestException:
             if attempt < self.max_retries:
                 delay = self.base_delay * (2 ** attempt)
-                time.sleep(delay)
-                return self.make_request(prompt, attempt + 1)
+                self._sleep(delay)
+                if on_chunk:
+                    on_chunk("")
+                return self.make_request(prompt, attempt + 1, on_chunk)
             raise NetworkError()
 
         except Exception:
             if attempt < self.max_retries:
                 delay = self.base_delay * (2 ** attempt)
-                time.sleep(delay)
-                return self.make_request(prompt, attempt + 1)
+                self._sleep(delay)
+                if on_chunk:
+                    on_chunk("")
+                return self.make_request(prompt, attempt + 1, on_chunk)
+            raise APIResponseError(500)
+
+    def _read_stream(self, response: requests.Response, on_chunk: Callable[[str], None]) -> str:
+        """Читает потоковый ответ (server-sent events), передавая куски текста в on_chunk"""
+        parts = []
+        with tracing.span("read_stream"):
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                payload = line[len(b"data:"):].strip()
+                if payload == b"[DONE]":
+                    break
+                chunk = json.loads(payload)
+                # usage приходит в последнем куске потока
+                if chunk.get("usage") and self.spend_governor is not None:
+                    self.spend_governor.record_usage(chunk["usage"])
+                choices = chunk.get("choices") or []
+                if choices:
+                    text = (choices[0].get("delta") or {}).get("content") or ""
+                    if text:
+                        parts.append(text)
+                        on_chunk(text)
+
+        if not parts:
             raise APIResponseError(500)
+        return "".join(parts)
 
     def get_essay_structure(self, topic: str, num_chapters: int, language: str = "Русский") -> str:
-        """Получает структуру реферата"""
-        prompt = f"""Создай структуру реферата на тему "{topic}".
+        """Получает структуру реферата (из кэша предзагрузки, если она есть)"""
+        key = (topic, num_chapters, language)
+        with self._structure_lock:
+            self._structure_consumed.add(key)
+            if key in self._structure_cache:
+                return self._structure_cache.pop(key)
+            pending = self._structure_pending.get(key)
+
+        # Предзагрузка этой темы ещё идёт - дожидаемся её, а не дублируем запрос
+        if pending is not None:
+            with tracing.span("prefetch_wait", topic=topic):
+                pending.wait()
+            with self._structure_lock:
+                if key in self._structure_cache:
+                    return self._structure_cache.pop(key)
+
+        return self.make_request(self.structure_prompt(topic, num_chapters, language))
+
+    def prefetch_structure(self, topic: str, num_chapters: int, language: str = "Русский") -> None:
+        """Заранее получает структуру реферата и кладёт её в кэш"""
+        key = (topic, num_chapters, language)
+        with self._structure_lock:
+            if key in self._structure_cache or key in self._structure_pending or key in self._structure_consumed:
+                return
+            event = threading.Event()
+            self._structure_pending[key] = event
+
+        try:
+            # Спекулятивный запрос не должен ждать повторных попыток
+            structure = self.make_request(
+                self.structure_prompt(topic, num_chapters, language),
+                attempt=self.max_retries
+            )
+            if structure:
+                with self._structure_lock:
+                    self._structure_cache[key] = structure
+        except APIError:
+            pass
+        finally:
+            with self._structure_lock:
+                self._structure_pending.pop(key, None)
+            event.set()
+
+    def retain_structures(self, keys: Set[Tuple[str, int, str]]) -> None:
+        """Удаляет из кэша предзагруженные структуры, которые не понадобятся (кроме keys)"""
+        with self._structure_lock:
+            for key in list(self._structure_cache):
+                if key not in keys:
+                    del self._structure_cache[key]
+
+    def structure_prompt(self, topic: str, num_chapters: int, language: str) -> str:
+        """Формирует промпт для структуры реферата"""
+        return f"""Создай структуру реферата на тему "{topic}".
 
                         Язык генерации: {language}
 
@@ -155,10 +303,15 @@ class APIClient:
                         Глава 2. [Название]
                         ..."""
 
-        return self.make_request(prompt)
-
-    def generate_section_content(self, topic: str, section_name: str, symbols_per_chapter: int, language: str = "Русский") -> str:
+    def generate_section_content(self, topic: str, section_name: str, symbols_per_chapter: int, language: str = "Русский", on_chunk: Optional[Callable[[str], None]] = None) -> str:
         """Генерирует содержимое раздела"""
+        return self.make_request(
+            self.section_prompt(topic, section_name, symbols_per_chapter, language),
+            on_chunk=on_chunk
+        )
+
+    def section_prompt(self, topic: str, section_name: str, symbols_per_chapter: int, language: str = "Русский") -> str:
+        """Формирует промпт для содержимого раздела"""
         if "Введение" in section_name:
             prompt = f"""Напиши введение для реферата на тему "{topic}".
 
@@ -183,4 +336,4 @@ class APIClient:
                         - Не используй цитаты или ссылки
                         - Не добавляй название главы в начало текста"""
 
-        return self.make_request(prompt)
+        return prompt
@@ -0,0 +1,144 @@
+import requests
+import json
+import time
+from typing import Callable, Dict, Optional
+from models.api_client import APIClient, APIResponseError, NetworkError
+from utils import tracing
+
+
+class BatchCancelled(Exception):
+    """Пакетное задание отменено пользователем"""
+
+
+class BatchClient:
+    """Клиент пакетного (batch) API: один JSONL-файл вместо тысяч отдельных запросов"""
+
+    FINAL_STATUSES = ("COMPLETED", "FAILED", "EXPIRED", "CANCELLED")
+
+    def __init__(self, api_client: APIClient, poll_interval: int = 30):
+        self.api_client = api_client
+        self.poll_interval = poll_interval
+
+    def run(self, prompts: Dict[str, str],
+            on_status: Optional[Callable[[str], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, str]:
+        """Отправляет промпты одним заданием, ждёт его завершения и возвращает ответы по custom_id
+
+        Задание, завершившееся не полностью (EXPIRED, FAILED), может вернуть часть ответов:
+        они уже оплачены и возвращаются, недостающие custom_id вызывающий дозапрашивает сам.
+        """
+        with tracing.span("batch_submit", requests=len(prompts)):
+            batch_id = self.submit(prompts)
+        with tracing.span("batch_wait", batch_id=batch_id):
+            batch = self.wait(batch_id, on_status, should_stop)
+        with tracing.span("batch_results", batch_id=batch_id):
+            results = self.results(batch)
+        if not results and batch.get("status", "").upper() != "COMPLETED":
+            raise APIResponseError(500)
+        return results
+
+    def build_job_file(self, prompts: Dict[str, str]) -> bytes:
+        """Собирает JSONL-файл задания: одна строка на запрос"""
+        lines = []
+        for custom_id, prompt in prompts.items():
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "body": self.api_client.build_payload(prompt)
+            }, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def submit(self, prompts: Dict[str, str]) -> str:
+        """Загружает файл задания и создаёт пакетное задание"""
+        upload = self._request(
+            "post", "/files/upload",
+            files={"file": ("batch.jsonl", self.build_job_file(prompts), "application/jsonl")},
+            data={"purpose": "batch-api", "file_name": "batch.jsonl"}
+        )
+        created = self._request(
+            "post", "/batches",
+            json={
+                "input_file_id": upload["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            }
+        )
+        # together.ai оборачивает задание в "job", OpenAI-совместимые API - нет
+        return created.get("job", created)["id"]
+
+    def wait(self, batch_id: str,
+             on_status: Optional[Callable[[str], None]] = None,
+             should_stop: Optional[Callable[[], bool]] = None) -> dict:
+        """Опрашивает задание до финального статуса"""
+        while True:
+            batch = self._request("get", f"/batches/{batch_id}")
+            status = batch.get("status", "").upper()
+            if on_status:
+                on_status(status)
+            if status in self.FINAL_STATUSES:
+                return batch
+
+            # Ждём следующего опроса небольшими шагами, чтобы быстро реагировать на отмену
+            deadline = time.monotonic() + self.poll_interval
+            while time.monotonic() < deadline:
+                if should_stop and should_stop():
+                    self.cancel(batch_id)
+                    raise BatchCancelled()
+                time.sleep(min(1, self.poll_interval))
+
+    def cancel(self, batch_id: str) -> None:
+        """Отменяет задание на стороне сервиса"""
+        try:
+            self._request("post", f"/batches/{batch_id}/cancel")
+        except (APIResponseError, NetworkError):
+            pass
+
+    def results(self, batch: dict) -> Dict[str, str]:
+        """Скачивает выходной файл и разбирает ответы по custom_id"""
+        output_file_id = batch.get("output_file_id")
+        if not output_file_id:
+            return {}
+
+        response = self._raw_request("get", f"/files/{output_file_id}/content")
+        results = {}
+        for line in response.content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            body = item.get("response", {})
+            body = body.get("body", body)
+            if self.api_client.spend_governor is not None:
+                self.api_client.spend_governor.record_usage(body.get("usage"), bulk=True)
+            choices = body.get("choices") or []
+            if choices:
+                results[item["custom_id"]] = choices[0]["message"]["content"]
+        return results
+
+    def _raw_request(self, method: str, path: str, attempt: int = 0, **kwargs) -> requests.Response:
+        """Выполняет запрос к API пакетных заданий (GET - с повторными попытками)"""
+        # Опрос и скачивание результатов можно безопасно повторять: сбой сети
+        # не должен стоить уже оплаченного задания, которое выполнялось часами
+        retry = method == "get" and attempt < self.api_client.max_retries
+        headers = {"Authorization": f"Bearer {self.api_client.api_key}"}
+        try:
+            response = requests.request(
+                method,
+                f"{self.api_client.api_base}{path}",
+                headers=headers,
+                timeout=60,
+                **kwargs
+            )
+        except requests.exceptions.RequestException:
+            if retry:
+                self.api_client._sleep(self.api_client.base_delay * (2 ** attempt))
+                return self._raw_request(method, path, attempt + 1, **kwargs)
+            raise NetworkError()
+
+        if response.status_code != 200:
+            if retry and (response.status_code == 429 or response.status_code >= 500):
+                self.api_client._sleep(self.api_client.base_delay * (2 ** attempt))
+                return self._raw_request(method, path, attempt + 1, **kwargs)
+            raise APIResponseError(response.status_code)
+        return response
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        return self._raw_request(method, path, **kwargs).json()
@@ -0,0 +1,166 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from config import PRICE_PER_MTOKEN, SPEND_LIMIT
+from models.api_client import APIClient
+from models.throughput import INTRODUCTION_SYMBOLS
+
+# Примерное число символов на токен у токенизатора Llama 3
+CHARS_PER_TOKEN = {
+    "Русский": 3.0,
+    "English": 4.0,
+    "Українська": 2.8,
+    "Беларуская": 2.7,
+}
+
+# Пакетные задания together.ai стоят вдвое дешевле обычных запросов
+BATCH_DISCOUNT = 0.5
+
+# Примерная длина строки структуры: "Глава N. Название"
+STRUCTURE_LINE_SYMBOLS = 60
+
+
+@dataclass
+class CostEstimate:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "CostEstimate") -> "CostEstimate":
+        return CostEstimate(
+            self.requests + other.requests,
+            self.prompt_tokens + other.prompt_tokens,
+            self.completion_tokens + other.completion_tokens,
+            self.cost + other.cost
+        )
+
+
+class CostPlanner:
+    """Оценка токенов и стоимости генерации до отправки запросов"""
+
+    def __init__(self, api_client: APIClient, price_per_million: float = PRICE_PER_MTOKEN):
+        self.api_client = api_client
+        self.price_per_million = price_per_million
+
+    def _tokens(self, symbols: int, language: str) -> int:
+        return int(symbols / CHARS_PER_TOKEN.get(language, 3.0)) + 1
+
+    def estimate_request(self, prompt: str, completion_symbols: int, language: str = "Русский",
+                         bulk: bool = False) -> CostEstimate:
+        """Оценка одного запроса с готовым промптом"""
+        max_tokens = self.api_client.build_payload("")["max_tokens"]
+        prompt_tokens = self._tokens(len(prompt), language)
+        completion_tokens = min(self._tokens(completion_symbols, language), max_tokens)
+        return CostEstimate(
+            requests=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=self.cost(prompt_tokens + completion_tokens, bulk)
+        )
+
+    def estimate_structure(self, topic: str, num_chapters: int, language: str = "Русский",
+                           bulk: bool = False) -> CostEstimate:
+        """Оценка одного запроса структуры"""
+        prompt_tokens = self._tokens(len(self.api_client.structure_prompt(topic, num_chapters, language)), language)
+        completion_tokens = self._tokens((num_chapters + 1) * STRUCTURE_LINE_SYMBOLS, language)
+        return CostEstimate(
+            requests=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=self.cost(prompt_tokens + completion_tokens, bulk)
+        )
+
+    def estimate_topic(self, topic: str, num_chapters: int, symbols_per_chapter: int,
+                       language: str = "Русский", bulk: bool = False) -> CostEstimate:
+        """Оценка одного реферата: структура, введение и главы"""
+        # Ответ модели не длиннее max_tokens, сколько бы символов ни просили
+        max_tokens = self.api_client.build_payload("")["max_tokens"]
+        chapter_title = f"Глава 1. {topic}"
+
+        prompts = [self.api_client.section_prompt(topic, "Введение", symbols_per_chapter, language)]
+        prompts += [self.api_client.section_prompt(topic, chapter_title, symbols_per_chapter, language)] * num_chapters
+        prompt_tokens = sum(self._tokens(len(prompt), language) for prompt in prompts)
+
+        completion_tokens = min(self._tokens(INTRODUCTION_SYMBOLS, language), max_tokens)
+        completion_tokens += num_chapters * min(self._tokens(symbols_per_chapter, language), max_tokens)
+
+        return self.estimate_structure(topic, num_chapters, language, bulk) + CostEstimate(
+            requests=len(prompts),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=self.cost(prompt_tokens + completion_tokens, bulk)
+        )
+
+    def estimate(self, topics: List[str], num_chapters: int, symbols_per_chapter: int,
+                 language: str = "Русский", bulk: bool = False) -> CostEstimate:
+        """Оценка всего списка тем"""
+        total = CostEstimate()
+        for topic in topics:
+            total += self.estimate_topic(topic, num_chapters, symbols_per_chapter, language, bulk)
+        return total
+
+    def cost(self, tokens: int, bulk: bool = False) -> float:
+        """Стоимость токенов в долларах"""
+        return tokens / 1_000_000 * self.price_per_million * (BATCH_DISCOUNT if bulk else 1.0)
+
+
+class SpendGovernor:
+    """Жёсткий лимит расходов: учитывает фактический usage и резервирует оценку для начатых рефератов"""
+
+    def __init__(self, limit: float = SPEND_LIMIT, price_per_million: float = PRICE_PER_MTOKEN):
+        self.limit = limit  # 0 - без ограничения
+        self.price_per_million = price_per_million
+        self.lock = threading.Lock()
+        self.spent = 0.0
+        self.tokens = 0
+        # Резервы по потокам: usage, пришедший в потоке, уменьшает его резерв
+        self._reservations: Dict[int, float] = {}
+
+    @property
+    def reserved(self) -> float:
+        """Сумма резервов начатых, но ещё не оплаченных запросов"""
+        with self.lock:
+            return self._reserved()
+
+    def _reserved(self) -> float:
+        return sum(self._reservations.values())
+
+    def record_usage(self, usage: Optional[dict], bulk: bool = False) -> None:
+        """Учитывает usage из ответа API"""
+        if not usage:
+            return
+        tokens = usage.get("total_tokens") or (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+        cost = tokens / 1_000_000 * self.price_per_million * (BATCH_DISCOUNT if bulk else 1.0)
+        with self.lock:
+            self.tokens += tokens
+            self.spent += cost
+            # Оплаченная часть уже в spent - в резерве её держать нельзя, иначе она учтётся дважды
+            thread_id = threading.get_ident()
+            if thread_id in self._reservations:
+                self._reservations[thread_id] = max(self._reservations[thread_id] - cost, 0.0)
+
+    def available(self) -> Optional[float]:
+        """Сколько ещё можно потратить (None - без ограничения)"""
+        if not self.limit:
+            return None
+        with self.lock:
+            return max(self.limit - self.spent - self._reserved(), 0.0)
+
+    def try_reserve(self, amount: float) -> bool:
+        """Резервирует за текущим потоком оценку стоимости; False - если она не укладывается в лимит"""
+        with self.lock:
+            if self.limit and self.spent + self._reserved() + amount > self.limit:
+                return False
+            thread_id = threading.get_ident()
+            self._reservations[thread_id] = self._reservations.get(thread_id, 0.0) + amount
+            return True
+
+    def release(self) -> None:
+        """Снимает остаток резерва текущего потока (фактические расходы уже учтены в spent)"""
+        with self.lock:
+            self._reservations.pop(threading.get_ident(), None)
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+from typing import Tuple
+
+# Объём введения, который запрашивается у модели (см. APIClient.section_prompt)
+INTRODUCTION_SYMBOLS = 2000
+
+
+def job_work(num_topics: int, num_chapters: int, symbols_per_chapter: int) -> Tuple[int, int]:
+    """Сколько запросов и запрошенных символов нужно на список тем"""
+    # структура + введение + главы
+    requests_per_topic = num_chapters + 2
+    symbols_per_topic = INTRODUCTION_SYMBOLS + num_chapters * symbols_per_chapter
+    return num_topics * requests_per_topic, num_topics * symbols_per_topic
+
+
+class ThroughputModel:
+    """Скользящая (EWMA) оценка скорости генерации, сохраняемая между запусками"""
+
+    def __init__(self, path: str, alpha: float = 0.2):
+        self.path = path
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        # Начальные значения - грубая оценка до первых измерений
+        self.seconds_per_request = 3.0
+        self.seconds_per_symbol = 0.01
+        self.wait_per_request = 0.0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.seconds_per_request = float(data["seconds_per_request"])
+            self.seconds_per_symbol = float(data["seconds_per_symbol"])
+            self.wait_per_request = float(data["wait_per_request"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self) -> None:
+        """Сохраняет модель на диск"""
+        with self.lock:
+            data = {
+                "seconds_per_request": self.seconds_per_request,
+                "seconds_per_symbol": self.seconds_per_symbol,
+                "wait_per_request": self.wait_per_request,
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except OSError:
+            pass
+
+    def _ewma(self, current: float, sample: float) -> float:
+        return (1 - self.alpha) * current + self.alpha * sample
+
+    def record(self, seconds: float, symbols: int, wait: float = 0.0) -> None:
+        """Учитывает один запрос: чистое время ответа, запрошенный объём и время ожидания (backoff, лимит)"""
+        with self.lock:
+            self.wait_per_request = self._ewma(self.wait_per_request, wait)
+            if symbols <= 0:
+                # Запрос структуры почти ничего не генерирует - это и есть накладные расходы запроса
+                self.seconds_per_request = self._ewma(self.seconds_per_request, seconds)
+            else:
+                per_symbol = max(seconds - self.seconds_per_request, 0.0) / symbols
+                self.seconds_per_symbol = self._ewma(self.seconds_per_symbol, per_symbol)
+
+    def estimate(self, requests: int, symbols: int, concurrency: int = 1, min_interval: float = 0.0) -> float:
+        """Оставшееся время в секундах для заданного объёма работы"""
+        with self.lock:
+            total = (requests * (self.seconds_per_request + self.wait_per_request)
+                     + symbols * self.seconds_per_symbol)
+        seconds = total / max(concurrency, 1)
+        # Общий лимит запросов в минуту не даёт параллельности ускорить работу сильнее него
+        return max(seconds, requests * min_interval)
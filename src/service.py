@@ -0,0 +1,341 @@
+"""Режим сервиса: генерация рефератов через локальный HTTP API (без графического интерфейса).
+
+Запуск: python service.py --port 8080 --output ./essays
+Требует aiohttp (pip install aiohttp).
+
+POST /jobs                      - поставить темы в очередь
+GET  /jobs                      - список заданий
+GET  /jobs/{id}                 - статус задания
+GET  /jobs/{id}/events          - поток событий (text/event-stream)
+POST /jobs/{id}/pause|resume|cancel
+GET  /jobs/{id}/files           - готовые .docx и .zip
+GET  /jobs/{id}/files/{name}    - скачать файл
+"""
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List
+
+from aiohttp import web
+from PySide6.QtCore import Qt
+
+from config import DATA_DIR, WORKERS, TRACE_ENABLED
+from controllers.essay_generator import GeneratorWorker, BatchGeneratorWorker
+from controllers.job_queue import Job, JobQueue, JobStatus
+from models import APIClient, CostPlanner, SpendGovernor
+from utils import tracing
+
+
+class GenerationService:
+    """Очередь заданий, которые выполняются теми же worker'ами, что и в окне программы"""
+
+    # События, последнее из которых получает подписчик, подключившийся позже
+    HISTORY_EVENTS = ("status", "status_message", "progress", "finished")
+
+    def __init__(self, output_root: str, max_workers: int = WORKERS):
+        self.output_root = output_root
+        self.max_workers = max_workers
+        # Общий клиент: одно соединение и один лимит запросов на все задания
+        self.api_client = APIClient()
+        # Общий лимит расходов: задания, не уложившиеся в него, откладываются на паузу
+        self.planner = CostPlanner(self.api_client)
+        self.governor = SpendGovernor()
+        self.api_client.spend_governor = self.governor
+        self.queue = JobQueue(os.path.join(DATA_DIR, "service_jobs.json"))
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.workers: Dict[str, GeneratorWorker] = {}
+        # Для новых подписчиков хранится только последнее событие каждого вида (статус, прогресс, итог)
+        self.events: Dict[str, Dict[str, dict]] = {}
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self.loop = None
+        self.tracer = None
+
+    def start(self) -> None:
+        """Запускает задания, оставшиеся в очереди с прошлого запуска"""
+        self.loop = asyncio.get_running_loop()
+        self._dispatch()
+
+    def job_dir(self, job: Job) -> str:
+        """Каталог с документами задания"""
+        return os.path.join(job.output_path, job.id)
+
+    def job_files(self, job: Job) -> List[str]:
+        """Готовые документы и архивы задания"""
+        path = self.job_dir(job)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if name.endswith((".docx", ".zip")))
+
+    def submit(self, job: Job) -> Job:
+        self.queue.submit(job)
+        self._publish(job.id, {"type": "status", "status": job.status})
+        self._dispatch()
+        return job
+
+    def pause(self, job_id: str) -> None:
+        if self.queue.pause(job_id, self.workers.get(job_id)):
+            self._publish(job_id, {"type": "status", "status": JobStatus.PAUSED})
+
+    def resume(self, job_id: str) -> None:
+        if self.queue.resume(job_id, self.workers.get(job_id)):
+            self._publish(job_id, {"type": "status", "status": self.queue.get(job_id).status})
+            self._dispatch()
+
+    def cancel(self, job_id: str) -> None:
+        # Запущенный worker сам пришлёт событие finished
+        if self.queue.cancel(job_id, self.workers.get(job_id)) and job_id not in self.workers:
+            self._publish(job_id, {"type": "finished", "success": False, "message": "Задание отменено"})
+
+    def _dispatch(self) -> None:
+        """Запускает задания из очереди, пока есть свободные потоки"""
+        while len(self.workers) < self.max_workers:
+            job = self.queue.next_pending()
+            if job is None:
+                break
+            self._publish(job.id, {"type": "status", "status": job.status})
+            # Место в пуле занимается сразу, а не когда корутина начнёт выполняться
+            worker = self._create_worker(job)
+            asyncio.ensure_future(self._run_job(job, worker))
+
+    def _create_worker(self, job: Job) -> GeneratorWorker:
+        """Создает worker для задания и подключает его сигналы к циклу событий"""
+        os.makedirs(self.job_dir(job), exist_ok=True)
+        worker_class = BatchGeneratorWorker if job.bulk else GeneratorWorker
+        worker = worker_class(job.remaining_topics, job.num_chapters, job.symbols_per_chapter,
+                              self.job_dir(job), job.language, self.api_client)
+        worker.archive_mode = job.archive
+        if TRACE_ENABLED:
+            if self.tracer is None:
+                self.tracer = tracing.Tracer()
+            worker.tracer = self.tracer
+            worker.trace_name = f"{job.id}: {job.title}"
+            worker.queued_at = job.queued_at
+        self.workers[job.id] = worker
+
+        def forward(event_type, **fields):
+            self.loop.call_soon_threadsafe(self._on_worker_event, job.id, worker, dict(type=event_type, **fields))
+
+        # Цикла событий Qt здесь нет - сигналы обрабатываются прямо в потоке worker'а
+        direct = Qt.ConnectionType.DirectConnection
+        worker.progress.connect(lambda value: forward("progress", value=value), direct)
+        worker.status.connect(lambda message: forward("status_message", message=message), direct)
+        worker.essay_completed.connect(lambda topic: forward("essay", topic=topic), direct)
+        worker.essay_failed.connect(lambda topic: forward("essay_failed", topic=topic), direct)
+        worker.finished.connect(lambda success, message: forward("finished", success=success, message=message), direct)
+
+        return worker
+
+    async def _run_job(self, job: Job, worker: GeneratorWorker) -> None:
+        """Выполняет задание в пуле потоков и освобождает место для следующего"""
+        try:
+            await self.loop.run_in_executor(self.executor, worker.run)
+        finally:
+            self.workers.pop(job.id, None)
+            self._dispatch()
+            # Очередь опустела - сохраняем трассу этого периода работы
+            if not self.workers and self.tracer is not None:
+                self.tracer.export(tracing.trace_path(os.path.join(DATA_DIR, "traces")))
+                self.tracer = None
+
+    def _on_worker_event(self, job_id: str, worker: GeneratorWorker, event: dict) -> None:
+        """Обновляет задание по событию worker'а (выполняется в цикле событий)"""
+        job = self.queue.get(job_id)
+        if event["type"] == "progress":
+            progress = job.overall_progress(len(worker.topics), event["value"])
+            self.queue.update(job_id, progress=progress)
+            event = {"type": "progress", "value": progress}
+        elif event["type"] == "essay":
+            self.queue.update(job_id, completed_topics=job.completed_topics + [event["topic"]])
+        elif event["type"] == "essay_failed":
+            self.queue.update(job_id, failed_topics=job.failed_topics + [event["topic"]])
+        elif event["type"] == "finished":
+            job = self.queue.finish(job_id, event["success"], event["message"], worker.deferred)
+            event["status"] = job.status
+        self._publish(job_id, event)
+
+    def _publish(self, job_id: str, event: dict) -> None:
+        """Запоминает событие для новых подписчиков и рассылает его текущим"""
+        history = self.events.setdefault(job_id, {})
+        if event["type"] == "status" and event["status"] in (JobStatus.PENDING, JobStatus.RUNNING):
+            # Задание снова в работе - итог прошлого запуска больше не актуален
+            history.pop("finished", None)
+        if event["type"] in self.HISTORY_EVENTS:
+            # Повторное событие переезжает в конец, чтобы история воспроизводилась по порядку
+            history.pop(event["type"], None)
+            history[event["type"]] = event
+        for queue in self.subscribers.get(job_id, []):
+            queue.put_nowait(event)
+
+    async def stream(self, job_id: str):
+        """События задания: сначала последние статус, прогресс и итог, затем новые до завершения"""
+        queue = asyncio.Queue()
+        history = list(self.events.get(job_id, {}).values())
+        already_finished = self.queue.get(job_id).status in JobStatus.FINAL
+        self.subscribers.setdefault(job_id, []).append(queue)
+        try:
+            for event in history:
+                yield event
+            if already_finished:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["type"] == "finished":
+                    return
+        finally:
+            self.subscribers[job_id].remove(queue)
+
+
+def json_error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def job_to_dict(service: GenerationService, job: Job) -> dict:
+    data = asdict(job)
+    del data["output_path"]
+    data["files"] = service.job_files(job)
+    return data
+
+
+def create_app(service: GenerationService) -> web.Application:
+    routes = web.RouteTableDef()
+
+    def get_job(request: web.Request) -> Job:
+        job = service.queue.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "Задание не найдено"}),
+                                   content_type="application/json")
+        return job
+
+    @routes.post("/jobs")
+    async def submit_job(request: web.Request):
+        try:
+            data = await request.json()
+        except ValueError:
+            return json_error(400, "Ожидается JSON")
+        if not isinstance(data, dict):
+            return json_error(400, "Ожидается JSON-объект")
+
+        topics = data.get("topics")
+        if isinstance(topics, str):
+            topics = topics.split("\n")
+        if not isinstance(topics, list):
+            return json_error(400, "topics - список тем или строка с темами через перевод строки")
+        topics = [str(topic).strip() for topic in topics if str(topic).strip()]
+        if not topics:
+            return json_error(400, "Нужна хотя бы одна тема")
+
+        try:
+            num_chapters = int(data.get("num_chapters", 5))
+            symbols_per_chapter = int(data.get("symbols_per_chapter", 2000))
+            priority = int(data.get("priority", 0))
+        except (TypeError, ValueError):
+            return json_error(400, "num_chapters, symbols_per_chapter и priority - целые числа")
+        # Те же границы, что и в окне программы
+        if not 3 <= num_chapters <= 10:
+            return json_error(400, "num_chapters должно быть от 3 до 10")
+        if not 1000 <= symbols_per_chapter <= 10000:
+            return json_error(400, "symbols_per_chapter должно быть от 1000 до 10000")
+
+        language = str(data.get("language", "Русский"))
+        bulk = bool(data.get("bulk", False))
+        estimate = service.planner.estimate(topics, num_chapters, symbols_per_chapter, language, bulk)
+        estimate = dict(asdict(estimate), total_tokens=estimate.total_tokens)
+        # dry_run - только оценка стоимости, без постановки в очередь
+        if data.get("dry_run"):
+            return web.json_response({"estimate": estimate, "available": service.governor.available()})
+
+        job = service.submit(Job(
+            topics=topics,
+            num_chapters=num_chapters,
+            symbols_per_chapter=symbols_per_chapter,
+            output_path=service.output_root,
+            language=language,
+            bulk=bulk,
+            priority=priority,
+            archive=bool(data.get("archive", False))
+        ))
+        return web.json_response(dict(job_to_dict(service, job), estimate=estimate), status=201)
+
+    @routes.get("/spend")
+    async def spend(request: web.Request):
+        governor = service.governor
+        return web.json_response({
+            "limit": governor.limit,
+            "spent": round(governor.spent, 6),
+            "tokens": governor.tokens,
+            "available": governor.available()
+        })
+
+    @routes.get("/jobs")
+    async def list_jobs(request: web.Request):
+        return web.json_response([job_to_dict(service, job) for job in service.queue.jobs()])
+
+    @routes.get("/jobs/{job_id}")
+    async def job_status(request: web.Request):
+        return web.json_response(job_to_dict(service, get_job(request)))
+
+    @routes.post("/jobs/{job_id}/{action:pause|resume|cancel}")
+    async def job_action(request: web.Request):
+        job = get_job(request)
+        getattr(service, request.match_info["action"])(job.id)
+        return web.json_response(job_to_dict(service, job))
+
+    @routes.get("/jobs/{job_id}/events")
+    async def job_events(request: web.Request):
+        job = get_job(request)
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache"
+        })
+        await response.prepare(request)
+        async for event in service.stream(job.id):
+            payload = json.dumps(event, ensure_ascii=False)
+            await response.write(f"event: {event['type']}\ndata: {payload}\n\n".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    @routes.get("/jobs/{job_id}/files")
+    async def job_files(request: web.Request):
+        return web.json_response(service.job_files(get_job(request)))
+
+    @routes.get("/jobs/{job_id}/files/{name}")
+    async def download_file(request: web.Request):
+        job = get_job(request)
+        name = request.match_info["name"]
+        # Отдаём только файлы из списка, чтобы имя нельзя было использовать для выхода из каталога
+        if name not in service.job_files(job):
+            return json_error(404, "Файл не найден")
+        return web.FileResponse(
+            os.path.join(service.job_dir(job), name),
+            headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(name)}"}
+        )
+
+    app = web.Application()
+    app.add_routes(routes)
+
+    async def on_startup(app):
+        service.start()
+
+    app.on_startup.append(on_startup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Рефератор: локальный HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--output", default=os.path.join(DATA_DIR, "service"), help="каталог для готовых рефератов")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="сколько заданий генерируется одновременно")
+    args = parser.parse_args()
+
+    service = GenerationService(args.output, args.workers)
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
 from .docx_formatter import DocumentFormatter
+from .archive_writer import EssayArchive
 
-__all__ = ['DocumentFormatter'] 
\ No newline at end of file
+__all__ = ['DocumentFormatter', 'EssayArchive'] 
\ No newline at end of file
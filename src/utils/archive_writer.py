@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import tempfile
+import zipfile
+from typing import Optional, Set
+from docx import Document
+from models import Essay
+
+
+def safe_filename(topic: str) -> str:
+    """Имя файла реферата без недопустимых символов"""
+    safe = "".join(x for x in topic if x.isalnum() or x in (' ', '-', '_')).strip()
+    return f"Реферат - {safe}.docx"
+
+
+def _numbered(name: str):
+    """Имя, затем имя с номерами: "a.docx", "a (2).docx", "a (3).docx", ..."""
+    yield name
+    base, dot, ext = name.rpartition(".")
+    counter = 2
+    while True:
+        yield f"{base} ({counter}){dot}{ext}"
+        counter += 1
+
+
+def unique_filename(name: str, used: Set[str]) -> str:
+    """Добавляет к имени номер, если такое уже есть в used, и запоминает результат"""
+    for candidate in _numbered(name):
+        if candidate.lower() not in used:
+            used.add(candidate.lower())
+            return candidate
+
+
+def claim_filename(directory: str, name: str) -> str:
+    """Занимает в папке свободное имя, создавая пустой файл; возвращает занятое имя"""
+    # Проверка и создание - одна операция файловой системы (O_EXCL), поэтому два воркера
+    # или два процесса не получат одно и то же имя, даже если пишут в одну папку одновременно
+    for candidate in _numbered(name):
+        try:
+            fd = os.open(os.path.join(directory, candidate), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return candidate
+
+
+class EssayArchive:
+    """ZIP-архив, в который рефераты дописываются по одному по мере готовности"""
+
+    MANIFEST_NAME = "manifest.jsonl"
+
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.settings = settings
+        self.zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        # Манифест пишется построчно во временный файл и попадает в архив при закрытии
+        self.manifest = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.count = 0
+        self._used: Set[str] = set()
+
+    def add(self, essay: Essay, doc: Document, metrics: Optional[dict] = None) -> str:
+        """Записывает документ реферата и строку манифеста; возвращает имя файла в архиве"""
+        self.count += 1
+        # Порядковый номер в имени исключает перезапись рефератов с похожими темами
+        name = unique_filename(f"{self.count:04d} - {safe_filename(essay.topic)}", self._used)
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        self.zip.writestr(name, buffer.getvalue())
+
+        self.manifest.write(json.dumps({
+            "file": name,
+            "topic": essay.topic,
+            "settings": self.settings,
+            "sections": [
+                {"title": section.title, "is_chapter": section.is_chapter, "symbols": len(section.content)}
+                for section in essay.sections
+            ],
+            "metrics": metrics or {},
+        }, ensure_ascii=False) + "\n")
+        return name
+
+    def add_failed(self, topic: str, reason: str) -> None:
+        """Записывает в манифест тему, реферат по которой не получился"""
+        self.manifest.write(json.dumps({
+            "file": None,
+            "topic": topic,
+            "settings": self.settings,
+            "error": reason,
+        }, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        """Дописывает манифест и закрывает архив"""
+        if self.zip is None:
+            return
+        self.manifest.seek(0)
+        with self.zip.open(self.MANIFEST_NAME, "w") as entry:
+            for line in self.manifest:
+                entry.write(line.encode("utf-8"))
+        self.manifest.close()
+        self.zip.close()
+        self.zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -5,6 +5,7 @@ from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from models import Essay, Section
+from utils import tracing
 
 class DocumentFormatter:
     def __init__(self):
@@ -13,6 +14,11 @@ class DocumentFormatter:
     
     def create_document(self, essay: Essay) -> Document:
         """Создает отформатированный документ из реферата"""
+        with tracing.span("create_document", topic=essay.topic):
+            return self._build_document(essay)
+
+    def _build_document(self, essay: Essay) -> Document:
+        """Собирает документ: заголовок, разделы, нумерация страниц"""
         doc = Document()
         
         # Установка стиля для всего документа
@@ -43,8 +49,9 @@ class DocumentFormatter:
                 heading.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
             
             # Очищаем markdown и удаляем дублирование заголовка
-            clean_content = self._clean_markdown(section.content)
-            clean_content = self._remove_duplicate_title(section.title, clean_content)
+            with tracing.span("clean_markdown", symbols=len(section.content)):
+                clean_content = self._clean_markdown(section.content)
+                clean_content = self._remove_duplicate_title(section.title, clean_content)
             
             # Добавляем содержимое раздела с выравниванием по ширине
             content_paragraph = doc.add_paragraph(clean_content)
@@ -0,0 +1,211 @@
+"""Локальный стенд, имитирующий API together.ai (chat/completions и batch-задания).
+
+Запуск: python -m utils.mock_server --port 8765
+Затем: API_BASE=http://127.0.0.1:8765/v1 python main.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+def fake_completion(prompt: str) -> str:
+    """Правдоподобный ответ модели на промпт рефератора"""
+    if prompt.startswith("Создай структуру"):
+        match = re.search(r"(\d+) глав", prompt)
+        num_chapters = int(match.group(1)) if match else 3
+        lines = ["Введение"] + [f"Глава {i}. Аспект темы номер {i}" for i in range(1, num_chapters + 1)]
+        return "\n".join(lines)
+
+    match = re.search(r"Объём примерно (\d+) символов", prompt)
+    size = int(match.group(1)) if match else 2000
+    sentence = "Данный раздел подробно раскрывает рассматриваемый вопрос. "
+    return (sentence * (size // len(sentence) + 1))[:size].strip()
+
+
+def chat_response(payload: dict) -> dict:
+    """Ответ в формате chat/completions"""
+    prompt = payload["messages"][-1]["content"]
+    content = fake_completion(prompt)
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], delay: float = 0.0):
+        super().__init__(address, MockHandler)
+        self.delay = delay
+        # Для проверки незавершённых заданий: итоговый статус и сколько последних ответов потерять
+        self.batch_final_status = "COMPLETED"
+        self.batch_drop = 0
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def run_batch(self, batch: dict) -> None:
+        """Выполняет задание: читает входной JSONL и формирует выходной"""
+        lines = []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            lines.append(json.dumps({
+                "custom_id": item["custom_id"],
+                "response": {"status_code": 200, "body": chat_response(item["body"])}
+            }, ensure_ascii=False))
+        if self.batch_drop:
+            lines = lines[:-self.batch_drop]
+        if not lines:
+            return
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[output_id] = ("\n".join(lines) + "\n").encode("utf-8")
+        batch["output_file_id"] = output_id
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockServer
+
+    # Задание проходит эти статусы по одному на каждый опрос
+    BATCH_FLOW = ["VALIDATING", "IN_PROGRESS", "COMPLETED"]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data: dict, status: int = 200) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send_bytes(body, "application/json", status)
+
+    def _send_bytes(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, completion: dict) -> None:
+        """Отдаёт ответ по словам в формате server-sent events"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        content = completion["choices"][0]["message"]["content"]
+        for word in re.findall(r"\S+\s*", content):
+            chunk = {"id": completion["id"], "choices": [{"index": 0, "delta": {"content": word}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        final = {"id": completion["id"], "choices": [], "usage": completion["usage"]}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.close_connection = True
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match:
+            with self.server.lock:
+                batch = self.server.batches.get(match.group(1))
+                if batch is None:
+                    return self._send_json({"error": "not found"}, 404)
+                if batch["status"] in self.BATCH_FLOW[:-1]:
+                    batch["status"] = self.BATCH_FLOW[self.BATCH_FLOW.index(batch["status"]) + 1]
+                    if batch["status"] == "COMPLETED":
+                        batch["status"] = self.server.batch_final_status
+                        self.server.run_batch(batch)
+                return self._send_json(batch)
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match and match.group(1) in self.server.files:
+            return self._send_bytes(self.server.files[match.group(1)], "application/jsonl")
+
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_body()
+
+        if self.path == "/v1/chat/completions":
+            payload = json.loads(body)
+            if self.server.delay:
+                time.sleep(self.server.delay)
+            if payload.get("stream"):
+                return self._send_stream(chat_response(payload))
+            return self._send_json(chat_response(payload))
+
+        if self.path == "/v1/files/upload":
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    file_id = f"file-{uuid.uuid4().hex[:12]}"
+                    self.server.files[file_id] = part.get_payload(decode=True)
+                    return self._send_json({"id": file_id, "purpose": "batch-api"})
+            return self._send_json({"error": "file is required"}, 400)
+
+        if self.path == "/v1/batches":
+            request = json.loads(body)
+            if request.get("input_file_id") not in self.server.files:
+                return self._send_json({"error": "unknown input file"}, 400)
+            batch = {
+                "id": f"batch-{uuid.uuid4().hex[:12]}",
+                "status": "VALIDATING",
+                "input_file_id": request["input_file_id"],
+                "endpoint": request.get("endpoint"),
+                "output_file_id": None
+            }
+            with self.server.lock:
+                self.server.batches[batch["id"]] = batch
+            return self._send_json({"job": batch})
+
+        match = re.fullmatch(r"/v1/batches/([\w-]+)/cancel", self.path)
+        if match and match.group(1) in self.server.batches:
+            with self.server.lock:
+                batch = self.server.batches[match.group(1)]
+                batch["status"] = "CANCELLED"
+            return self._send_json(batch)
+
+        self._send_json({"error": "not found"}, 404)
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, delay: float = 0.0) -> Tuple[MockServer, str]:
+    """Запускает стенд в фоновом потоке; возвращает сервер и значение для API_BASE"""
+    server = MockServer((host, port), delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд API together.ai")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="задержка ответа chat/completions, сек")
+    args = parser.parse_args()
+
+    server = MockServer((args.host, args.port), args.delay)
+    print(f"API_BASE=http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
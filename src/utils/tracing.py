@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+# Трассировщик текущего потока; без него span() ничего не записывает
+_local = threading.local()
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class Tracer:
+    """Собирает интервалы этапов генерации и сохраняет их в формате Chrome/Perfetto trace"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add(self, name: str, start_us: int, duration_us: int, tid: Optional[int] = None, **args) -> None:
+        """Добавляет завершённый интервал"""
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": max(duration_us, 0),
+            "pid": self.pid,
+            "tid": tid if tid is not None else threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def name_thread(self, name: str) -> None:
+        """Подписывает текущий поток на временной шкале"""
+        with self.lock:
+            self.events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": {"name": name},
+            })
+
+    def export(self, path: str) -> None:
+        """Сохраняет трассу (открывается в chrome://tracing или ui.perfetto.dev)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            data = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add(self.name, self.start, _now_us() - self.start, **self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def trace_path(directory: str) -> str:
+    """Имя нового файла трассы в каталоге"""
+    return os.path.join(directory, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+
+
+def activate(tracer: Optional[Tracer], thread_name: str = "") -> None:
+    """Включает запись интервалов в текущем потоке (None - выключает)"""
+    _local.tracer = tracer
+    if tracer is not None and thread_name:
+        tracer.name_thread(thread_name)
+
+
+def span(name: str, **args):
+    """Интервал этапа: with span("section", title=title): ... Без трассировщика почти ничего не стоит"""
+    tracer = getattr(_local, "tracer", None)
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, args)
@@ -2,19 +2,32 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout,
                            QHBoxLayout, QLabel, QSpinBox, 
                            QPushButton, QTextEdit, QProgressBar, QMessageBox,
                            QScrollArea, QFrame, QFileDialog, QLineEdit,
-                           QComboBox, QDialog)
-from PySide6.QtCore import Qt
+                           QComboBox, QDialog, QCheckBox, QListWidget,
+                           QListWidgetItem, QDoubleSpinBox)
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QDesktopServices
 from PySide6.QtCore import QUrl
 from controllers.essay_generator import EssayGeneratorController
+from controllers.job_queue import JobStatus
+from views.update_buffer import UIUpdateBuffer
+from views.preview import SectionPreview
+from config import PREFETCH_ENABLED, SPEND_LIMIT
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.controller = EssayGeneratorController()
+        # Все обновления от генерации попадают в интерфейс не чаще 60 раз в секунду
+        self.update_buffer = UIUpdateBuffer(60, self)
         self.initUI()
         self.connectSignals()
         self.completed_essays = []  # Список готовых рефератов
+        self.eta_text = ""  # Оценка оставшегося времени от контроллера
+        self.refresh_jobs()
+        # Продолжаем задания, оставшиеся в очереди с прошлого запуска
+        self.controller.start_queue()
+        if self.prefetch_checkbox.isChecked():
+            self.controller.warm_up()
 
     def calculate_pages(self) -> float:
         """Рассчитывает примерное количество страниц"""
@@ -31,6 +44,32 @@ class MainWindow(QMainWindow):
         pages = self.calculate_pages()
         self.pages_label.setText(f"Примерно страниц: {pages}")
 
+    def topics(self, complete_only: bool = False) -> list:
+        """Введённые темы без пустых строк (complete_only - без последней, ещё набираемой строки)"""
+        lines = self.topics_input.toPlainText().split('\n')
+        if complete_only:
+            # Последняя строка считается законченной, только если после неё есть перевод строки
+            lines = lines[:-1]
+        return [line.strip() for line in lines if line.strip()]
+
+    def update_cost_label(self):
+        """Обновляет оценку стоимости генерации введённых тем"""
+        estimate = self.controller.estimate_cost(
+            self.topics(),
+            self.chapters_spin.value(),
+            self.symbols_spin.value(),
+            self.language_combo.currentText(),
+            self.bulk_checkbox.isChecked()
+        )
+        self.cost_label.setText(
+            f"Примерная стоимость: ${estimate.cost:.4f} (~{estimate.total_tokens} токенов, {estimate.requests} запросов)"
+        )
+
+    def update_spent_label(self):
+        """Показывает фактические расходы по usage из ответов API"""
+        governor = self.controller.governor
+        self.spent_label.setText(f"Потрачено: ${governor.spent:.4f} ({governor.tokens} токенов)")
+
     def initUI(self):
         """Инициализация пользовательского интерфейса"""
         self.setWindowTitle('Рефератор')
@@ -59,6 +98,20 @@ class MainWindow(QMainWindow):
         topics_layout.addWidget(topics_label)
         topics_layout.addWidget(self.topics_input)
 
+        # Предзагрузка структур запускается не на каждое нажатие, а после паузы в наборе
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(800)
+        self.prefetch_timer.timeout.connect(self.prefetch_structures)
+        self.topics_input.textChanged.connect(self.schedule_prefetch)
+
+        # Оценка стоимости пересчитывается после паузы в наборе, а не на каждую букву
+        self.cost_timer = QTimer(self)
+        self.cost_timer.setSingleShot(True)
+        self.cost_timer.setInterval(300)
+        self.cost_timer.timeout.connect(self.update_cost_label)
+        self.topics_input.textChanged.connect(self.cost_timer.start)
+
         # Добавляем кнопку очистки для тем
         topics_buttons_layout = QHBoxLayout()
         self.clear_topics_button = QPushButton("Очистить темы")
@@ -78,6 +131,8 @@ class MainWindow(QMainWindow):
         self.language_combo = QComboBox()
         self.language_combo.addItems(["Русский", "English", "Українська", "Беларуская"])
         self.language_combo.setCurrentText("Русский")
+        self.language_combo.currentTextChanged.connect(self.schedule_prefetch)
+        self.language_combo.currentTextChanged.connect(self.cost_timer.start)
         language_layout.addWidget(language_label)
         language_layout.addWidget(self.language_combo)
         language_layout.addStretch()
@@ -100,6 +155,8 @@ class MainWindow(QMainWindow):
         self.chapters_spin.setRange(3, 10)
         self.chapters_spin.setValue(5)
         self.chapters_spin.valueChanged.connect(self.update_pages_label)
+        self.chapters_spin.valueChanged.connect(self.schedule_prefetch)
+        self.chapters_spin.valueChanged.connect(self.cost_timer.start)
         chapters_layout.addWidget(chapters_label)
         chapters_layout.addWidget(self.chapters_spin)
         chapters_layout.addStretch()
@@ -112,6 +169,7 @@ class MainWindow(QMainWindow):
         self.symbols_spin.setValue(2000)
         self.symbols_spin.setSingleStep(500)
         self.symbols_spin.valueChanged.connect(self.update_pages_label)
+        self.symbols_spin.valueChanged.connect(self.cost_timer.start)
         symbols_layout.addWidget(symbols_label)
         symbols_layout.addWidget(self.symbols_spin)
         symbols_layout.addStretch()
@@ -123,16 +181,119 @@ class MainWindow(QMainWindow):
         pages_layout.addStretch()
         self.update_pages_label()  # Инициализируем значение
 
+        # Предзагрузка структур во время ввода тем
+        prefetch_layout = QHBoxLayout()
+        self.prefetch_checkbox = QCheckBox("Готовить структуры заранее, пока вводятся темы")
+        self.prefetch_checkbox.setChecked(PREFETCH_ENABLED)
+        self.prefetch_checkbox.toggled.connect(self.toggle_prefetch)
+        prefetch_layout.addWidget(self.prefetch_checkbox)
+        prefetch_layout.addStretch()
+
+        # Приоритет задания в очереди
+        priority_layout = QHBoxLayout()
+        priority_label = QLabel("Приоритет в очереди:")
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(0, 10)
+        self.priority_spin.setValue(0)
+        priority_layout.addWidget(priority_label)
+        priority_layout.addWidget(self.priority_spin)
+        priority_layout.addStretch()
+
+        # Пакетный режим для больших списков тем
+        bulk_layout = QHBoxLayout()
+        self.bulk_checkbox = QCheckBox("Пакетный режим (дешевле, но результат может занять часы)")
+        self.bulk_checkbox.toggled.connect(self.cost_timer.start)
+        bulk_layout.addWidget(self.bulk_checkbox)
+        bulk_layout.addStretch()
+
+        # Оценка стоимости и лимит расходов
+        cost_layout = QHBoxLayout()
+        self.cost_label = QLabel()
+        cost_layout.addWidget(self.cost_label)
+        cost_layout.addStretch()
+
+        limit_layout = QHBoxLayout()
+        limit_label = QLabel("Лимит расходов, $:")
+        self.limit_spin = QDoubleSpinBox()
+        self.limit_spin.setRange(0, 10000)
+        self.limit_spin.setDecimals(2)
+        self.limit_spin.setSingleStep(0.5)
+        self.limit_spin.setSpecialValueText("без лимита")
+        self.limit_spin.setValue(SPEND_LIMIT)
+        self.limit_spin.valueChanged.connect(self.controller.set_spend_limit)
+        self.spent_label = QLabel()
+        limit_layout.addWidget(limit_label)
+        limit_layout.addWidget(self.limit_spin)
+        limit_layout.addWidget(self.spent_label)
+        limit_layout.addStretch()
+
+        # Сохранение в один архив с манифестом
+        archive_layout = QHBoxLayout()
+        self.archive_checkbox = QCheckBox("Сохранять рефераты в один ZIP-архив с манифестом")
+        archive_layout.addWidget(self.archive_checkbox)
+        archive_layout.addStretch()
+
         # Обновляем settings_layout
         settings_layout.addLayout(language_layout)
         settings_layout.addLayout(path_layout)
         settings_layout.addLayout(chapters_layout)
         settings_layout.addLayout(symbols_layout)
         settings_layout.addLayout(pages_layout)
+        settings_layout.addLayout(cost_layout)
+        settings_layout.addLayout(limit_layout)
+        settings_layout.addLayout(prefetch_layout)
+        settings_layout.addLayout(bulk_layout)
+        settings_layout.addLayout(archive_layout)
+        settings_layout.addLayout(priority_layout)
+        self.update_cost_label()
+        self.update_spent_label()
+
+        # Очередь заданий
+        jobs_group = QFrame()
+        jobs_group.setFrameStyle(QFrame.Shape.StyledPanel | QFrame.Shadow.Raised)
+        jobs_layout = QVBoxLayout(jobs_group)
+
+        jobs_label = QLabel("Очередь заданий:")
+        self.jobs_list = QListWidget()
+        self.jobs_list.setMinimumHeight(120)
+        self.jobs_list.currentItemChanged.connect(self.update_job_buttons)
+        jobs_layout.addWidget(jobs_label)
+        jobs_layout.addWidget(self.jobs_list)
+
+        jobs_buttons_layout = QHBoxLayout()
+        self.pause_job_button = QPushButton("Пауза")
+        self.pause_job_button.clicked.connect(lambda: self.controller.pause_job(self.selected_job_id()))
+        self.resume_job_button = QPushButton("Продолжить")
+        self.resume_job_button.clicked.connect(lambda: self.controller.resume_job(self.selected_job_id()))
+        self.cancel_job_button = QPushButton("Отменить задание")
+        self.cancel_job_button.clicked.connect(lambda: self.controller.cancel_job(self.selected_job_id()))
+        self.clear_jobs_button = QPushButton("Убрать завершённые")
+        self.clear_jobs_button.clicked.connect(self.controller.clear_finished)
+        jobs_buttons_layout.addWidget(self.pause_job_button)
+        jobs_buttons_layout.addWidget(self.resume_job_button)
+        jobs_buttons_layout.addWidget(self.cancel_job_button)
+        jobs_buttons_layout.addStretch()
+        jobs_buttons_layout.addWidget(self.clear_jobs_button)
+        jobs_layout.addLayout(jobs_buttons_layout)
 
         # Добавляем группы в скроллируемую область
         scroll_layout.addWidget(topics_group)
         scroll_layout.addWidget(settings_group)
+        scroll_layout.addWidget(jobs_group)
+
+        # Предпросмотр текста разделов по мере генерации
+        preview_group = QFrame()
+        preview_group.setFrameStyle(QFrame.Shape.StyledPanel | QFrame.Shadow.Raised)
+        preview_layout = QVBoxLayout(preview_group)
+        self.preview_checkbox = QCheckBox("Показывать текст разделов по мере генерации")
+        self.preview_checkbox.toggled.connect(self.toggle_preview)
+        self.preview_text = SectionPreview()
+        self.preview_text.setMaximumBlockCount(2000)  # Старый текст уходит, чтобы не копить память
+        self.preview_text.setMinimumHeight(200)
+        self.preview_text.setVisible(False)
+        preview_layout.addWidget(self.preview_checkbox)
+        preview_layout.addWidget(self.preview_text)
+        scroll_layout.addWidget(preview_group)
         scroll_layout.addStretch()
         
         scroll.setWidget(scroll_content)
@@ -211,17 +372,50 @@ class MainWindow(QMainWindow):
         if path:
             self.path_input.setText(path)
 
+    def toggle_prefetch(self, enabled: bool):
+        """Включение предзагрузки: сразу прогреваем соединение и берём уже введённые темы"""
+        if enabled:
+            self.controller.warm_up()
+            self.schedule_prefetch()
+
+    def schedule_prefetch(self):
+        """Перезапускает таймер предзагрузки (debounce)"""
+        if self.prefetch_checkbox.isChecked():
+            self.prefetch_timer.start()
+
+    def prefetch_structures(self):
+        """Предзагружает структуры для полностью введённых строк"""
+        if not self.prefetch_checkbox.isChecked():
+            return
+        self.controller.prefetch_structures(
+            self.topics(complete_only=True),
+            self.chapters_spin.value(),
+            self.language_combo.currentText()
+        )
+
     def connectSignals(self):
         """Подключение сигналов контроллера"""
-        self.controller.progress.connect(self.update_progress)
-        self.controller.status.connect(self.update_status)
+        # Частые обновления идут через буфер: из них применяется только последнее за кадр
+        buffer = self.update_buffer
+        self.controller.progress.connect(lambda value: buffer.post("progress", value))
+        self.controller.status.connect(lambda message: buffer.post("status", message))
+        self.controller.eta.connect(lambda seconds, speed, bulk_pending: buffer.post("eta", seconds, speed, bulk_pending))
+        self.controller.job_updated.connect(lambda job_id: buffer.post("jobs"))
+        self.controller.section_text.connect(buffer.append_text, Qt.ConnectionType.DirectConnection)
+        buffer.on("progress", self.update_progress)
+        buffer.on("status", self.update_status)
+        buffer.on("eta", self.update_eta)
+        buffer.on("jobs", self.refresh_jobs)
+        buffer.on("text", self.preview_text.append_section)
+
         self.controller.finished.connect(self.generation_finished)
         self.controller.essay_completed.connect(self.update_completed_essays)
 
     def start_generation(self):
         """Начало генерации рефератов"""
-        topics = self.topics_input.toPlainText().strip().split('\n')
-        if not topics or not topics[0]:
+        # Темы разбираются так же, как при предзагрузке, чтобы структуры брались из кэша
+        topics = self.topics()
+        if not topics:
             QMessageBox.warning(self, "Ошибка", "Введите хотя бы одну тему!")
             return
 
@@ -229,39 +423,130 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите путь для сохранения рефератов!")
             return
 
-        self.completed_essays = []  # Очищаем список готовых рефератов
-        self.completed_label.setText("")
-        self.generate_button.setEnabled(False)
-        self.cancel_button.setEnabled(True)
-        self.progress_bar.setValue(0)
+        # Задание, которое не укладывается в остаток лимита, выполнится лишь частично
+        estimate = self.controller.estimate_cost(
+            topics,
+            self.chapters_spin.value(),
+            self.symbols_spin.value(),
+            self.language_combo.currentText(),
+            self.bulk_checkbox.isChecked()
+        )
+        available = self.controller.governor.available()
+        if available is not None and estimate.cost > available:
+            answer = QMessageBox.question(
+                self,
+                "Лимит расходов",
+                f"Примерная стоимость ${estimate.cost:.4f} больше остатка лимита ${available:.4f}.\n"
+                "Сгенерируются только рефераты, укладывающиеся в лимит, остальные будут отложены. Продолжить?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+
+        if not self.has_active_jobs():
+            self.completed_essays = []  # Очищаем список готовых рефератов
+            self.completed_label.setText("")
+            self.progress_bar.setValue(0)
+            self.eta_text = ""  # Оценка прошлой очереди к новому заданию не относится
         
+        # Задание встаёт в очередь, даже если другие ещё генерируются
         self.controller.generate_essays(
             topics=topics,
             num_chapters=self.chapters_spin.value(),
             symbols_per_chapter=self.symbols_spin.value(),
             output_path=self.path_input.text(),
-            language=self.language_combo.currentText()
+            language=self.language_combo.currentText(),
+            bulk=self.bulk_checkbox.isChecked(),
+            priority=self.priority_spin.value(),
+            archive=self.archive_checkbox.isChecked()
         )
 
     def update_progress(self, value: int):
         """Обновление прогресс-бара"""
         self.progress_bar.setValue(value)
+        self.render_progress_status()
+
+    def render_progress_status(self):
+        """Строка статуса с прогрессом и оценкой оставшегося времени"""
+        value = self.progress_bar.value()
         if value > 0:
-            remaining = 100 - value
-            eta = (remaining * 30) // 100  # Примерно 30 секунд на полную генерацию
-            self.status_label.setText(f"Прогресс: {value}% (осталось примерно {eta} сек.)")
+            self.status_label.setText(f"Прогресс: {value}%{self.eta_text}")
+
+    def update_eta(self, seconds: int, symbols_per_second: float, bulk_pending: bool = False):
+        """Обновление оценки оставшегося времени (по измеренной скорости генерации)"""
+        bulk_text = "пакетный режим: время зависит от сервиса"
+        if seconds < 0:
+            self.eta_text = f" ({bulk_text})" if bulk_pending else ""
+        else:
+            minutes, secs = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            if hours:
+                duration = f"{hours} ч. {minutes} мин."
+            elif minutes:
+                duration = f"{minutes} мин. {secs} сек."
+            else:
+                duration = f"{secs} сек."
+            self.eta_text = f" (осталось примерно {duration}, ~{symbols_per_second:.0f} симв./сек."
+            # Пакетные задания в оценку не входят
+            self.eta_text += f"; {bulk_text})" if bulk_pending else ")"
+        # В кадре прогресс применяется раньше оценки - перерисовываем строку со свежей оценкой
+        self.render_progress_status()
 
     def update_status(self, message: str):
         """Обновление статуса"""
         self.status_label.setText(message)
-        self.status_label.repaint()  # Принудительное обновление виджета
+
+    def toggle_preview(self, enabled: bool):
+        """Включение предпросмотра: новые задания будут получать текст по мере генерации"""
+        self.controller.preview_enabled = enabled
+        self.preview_text.setVisible(enabled)
 
     def cancel_generation(self):
-        """Отменяет текущую генерацию"""
-        if self.controller.worker:
-            self.controller.worker.stop_generation = True
+        """Отменяет все задания в очереди"""
+        if self.has_active_jobs():
+            self.controller.cancel_all()
             self.status_label.setText("Отмена генерации...")
 
+    def has_active_jobs(self) -> bool:
+        """Есть ли незавершённые задания"""
+        return any(job.status not in JobStatus.FINAL for job in self.controller.queue.jobs())
+
+    def selected_job_id(self) -> str:
+        """id выбранного в списке задания"""
+        item = self.jobs_list.currentItem()
+        return item.data(Qt.UserRole) if item else ""
+
+    def refresh_jobs(self, job_id: str = ""):
+        """Перерисовывает список заданий"""
+        selected = self.selected_job_id()
+        self.jobs_list.clear()
+        for job in self.controller.queue.jobs():
+            text = f"[{JobStatus.NAMES[job.status]}] {job.progress}% - {job.title}"
+            if job.priority:
+                text += f" (приоритет {job.priority})"
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, job.id)
+            if job.message and job.status != JobStatus.DONE:
+                item.setToolTip(job.message)
+            self.jobs_list.addItem(item)
+            if job.id == selected:
+                self.jobs_list.setCurrentItem(item)
+        active = self.has_active_jobs()
+        # Очередь опустела - оценка времени больше не актуальна
+        if not active and self.eta_text:
+            self.eta_text = ""
+            self.render_progress_status()
+        self.cancel_button.setEnabled(active)
+        self.update_job_buttons()
+        self.update_spent_label()
+
+    def update_job_buttons(self, *args):
+        """Включает кнопки, применимые к выбранному заданию"""
+        job = self.controller.queue.get(self.selected_job_id())
+        status = job.status if job else None
+        self.pause_job_button.setEnabled(status in (JobStatus.PENDING, JobStatus.RUNNING))
+        self.resume_job_button.setEnabled(status == JobStatus.PAUSED)
+        self.cancel_job_button.setEnabled(job is not None and status not in JobStatus.FINAL)
+
     def update_completed_essays(self, topic: str):
         """Обновляет список готовых рефератов"""
         self.completed_essays.append(topic)
@@ -271,9 +556,7 @@ class MainWindow(QMainWindow):
             )
 
     def generation_finished(self, success: bool, message: str):
-        """Обработка завершения генерации"""
-        self.generate_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
+        """Обработка завершения задания"""
         if success:
             QMessageBox.information(self, "Успех", message)
         else:
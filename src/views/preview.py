@@ -0,0 +1,68 @@
+from typing import Dict, Tuple
+from PySide6.QtWidgets import QPlainTextEdit
+from PySide6.QtGui import QTextCursor
+
+
+class SectionPreview(QPlainTextEdit):
+    """Предпросмотр текста разделов, которые генерируются одновременно"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        # Для каждого раздела - курсоры на начало и конец его текста: разделы разных потоков
+        # дописываются каждый на своё место, а не в конец документа
+        self.sections: Dict[Tuple[str, str], Tuple[QTextCursor, QTextCursor]] = {}
+
+    def _anchor(self, position: int) -> QTextCursor:
+        """Курсор, который не сдвигается, когда текст вставляют прямо в его позицию"""
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(position)
+        cursor.setKeepPositionOnInsert(True)
+        return cursor
+
+    def _open_section(self, topic: str, title: str) -> Tuple[QTextCursor, QTextCursor]:
+        """Добавляет заголовок раздела в конец предпросмотра"""
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        prefix = "\n\n" if cursor.position() else ""
+        cursor.insertText(f"{prefix}=== {topic}: {title} ===\n")
+        section = (self._anchor(cursor.position()), self._anchor(cursor.position()))
+        self.sections[(topic, title)] = section
+        return section
+
+    def append_section(self, topic: str, title: str, text: str, restarted: bool = False):
+        """Дописывает текст раздела без перерисовки всего содержимого (restarted - раздел начат заново)"""
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+
+        section = self.sections.get((topic, title))
+        # Текст раздела всегда идёт после заголовка: позиция 0 значит, что раздел
+        # вытеснен из документа ограничением на число строк
+        if section is None or section[0].position() == 0:
+            section = self._open_section(topic, title)
+        start, end = section
+
+        if restarted:
+            # Ответ перезапрошен после сбоя - убираем уже показанный текст раздела, где бы он ни был
+            cursor = QTextCursor(self.document())
+            cursor.setPosition(start.position())
+            cursor.setPosition(end.position(), QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+
+        if text:
+            cursor = QTextCursor(self.document())
+            cursor.setPosition(end.position())
+            cursor.insertText(text)
+            end.setPosition(cursor.position())
+
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def section_text(self, topic: str, title: str) -> str:
+        """Текст раздела, показанный в предпросмотре"""
+        start, end = self.sections[(topic, title)]
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(start.position())
+        cursor.setPosition(end.position(), QTextCursor.MoveMode.KeepAnchor)
+        # Переводы строк внутри выделения Qt возвращает как U+2029
+        return cursor.selectedText().replace("\u2029", "\n")
@@ -0,0 +1,62 @@
+import threading
+from typing import Callable, Dict, List, Set, Tuple
+from PySide6.QtCore import QObject, QTimer, Slot
+
+
+class UIUpdateBuffer(QObject):
+    """Копит обновления от потоков генерации и применяет их к интерфейсу раз в кадр"""
+
+    def __init__(self, fps: int = 60, parent=None):
+        super().__init__(parent)
+        # post() и append_text() вызываются из любого потока и только кладут данные в буфер;
+        # перерисовка интерфейса происходит одна на кадр, сколько бы сигналов ни пришло
+        self.lock = threading.Lock()
+        self.handlers: Dict[str, Callable] = {}
+        self._latest: Dict[str, Tuple[int, tuple]] = {}
+        self._texts: Dict[Tuple[str, str], List[str]] = {}
+        self._restarted: Set[Tuple[str, str]] = set()
+        self._seq = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000 // fps)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def on(self, kind: str, handler: Callable) -> None:
+        """Регистрирует обработчик обновлений вида kind ("text" - куски текста разделов)"""
+        self.handlers[kind] = handler
+
+    def post(self, kind: str, *args) -> None:
+        """Обновление, для которого важно только последнее значение (статус, прогресс)"""
+        with self.lock:
+            self._seq += 1
+            self._latest[kind] = (self._seq, args)
+
+    @Slot(str, str, str)
+    def append_text(self, topic: str, title: str, text: str) -> None:
+        """Кусок текста раздела; куски одного раздела за кадр склеиваются ("" - раздел начат заново)"""
+        with self.lock:
+            if text:
+                self._texts.setdefault((topic, title), []).append(text)
+            else:
+                # Куски оборванного ответа, ещё не показанные, больше не нужны
+                self._texts[(topic, title)] = []
+                self._restarted.add((topic, title))
+
+    def flush(self) -> None:
+        """Применяет накопленные обновления (вызывается таймером в потоке интерфейса)"""
+        with self.lock:
+            if not self._latest and not self._texts:
+                return
+            latest, self._latest = self._latest, {}
+            texts, self._texts = self._texts, {}
+            restarted, self._restarted = self._restarted, set()
+
+        # Обновления разных видов применяются в том порядке, в котором пришли
+        for kind, (_, args) in sorted(latest.items(), key=lambda item: item[1][0]):
+            if kind in self.handlers:
+                self.handlers[kind](*args)
+
+        if "text" in self.handlers:
+            for (topic, title), parts in texts.items():
+                self.handlers["text"](topic, title, "".join(parts), (topic, title) in restarted)
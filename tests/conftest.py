@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Модули приложения импортируются из src, как при запуске main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Виджеты в тестах создаются без дисплея
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,32 @@
+"""Имена файлов: рефераты из разных воркеров и запусков не перезаписывают друг друга"""
+import threading
+
+from utils.archive_writer import claim_filename
+
+
+def test_claim_skips_existing_files(tmp_path):
+    (tmp_path / "Реферат - Тема.docx").write_bytes(b"old")
+
+    name = claim_filename(str(tmp_path), "Реферат - Тема.docx")
+
+    assert name == "Реферат - Тема (2).docx"
+    assert (tmp_path / "Реферат - Тема.docx").read_bytes() == b"old"
+    assert (tmp_path / name).exists()
+
+
+def test_parallel_claims_get_distinct_names(tmp_path):
+    names = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        barrier.wait()
+        names.append(claim_filename(str(tmp_path), "Рефераты - 2026-01-01 00-00-00.zip"))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(names)) == 8
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names)
@@ -0,0 +1,139 @@
+"""Пакетный режим целиком: BatchGeneratorWorker против локального стенда API"""
+import json
+import zipfile
+
+import pytest
+
+from controllers.essay_generator import BatchGeneratorWorker
+from controllers.job_queue import Job
+from models import APIClient, CostPlanner, SpendGovernor
+from utils import tracing
+from utils.mock_server import start_mock_server
+
+TOPICS = ["Фотосинтез", "История Древнего Рима"]
+
+
+@pytest.fixture
+def mock_server():
+    server, api_base = start_mock_server()
+    yield server, api_base
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def api_client(mock_server):
+    _, api_base = mock_server
+    client = APIClient(base_delay=0)
+    client.api_base = api_base
+    client.base_url = f"{api_base}/chat/completions"
+    return client
+
+
+def run_worker(worker: BatchGeneratorWorker) -> dict:
+    """Выполняет worker в текущем потоке и собирает его сигналы"""
+    events = {"essays": [], "finished": []}
+    worker.essay_completed.connect(lambda topic: events["essays"].append(topic))
+    worker.finished.connect(lambda success, message: events["finished"].append((success, message)))
+    worker.run()
+    return events
+
+
+def test_batch_worker_saves_documents(api_client, tmp_path):
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    events = run_worker(worker)
+
+    assert events["finished"] == [(True, "Рефераты успешно сгенерированы! 🎉")]
+    assert events["essays"] == TOPICS
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"Реферат - {topic}.docx" for topic in TOPICS
+    )
+
+
+def test_batch_worker_writes_archive_with_manifest(api_client, tmp_path):
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    worker.archive_mode = True
+    events = run_worker(worker)
+
+    assert events["finished"][0][0]
+    archives = list(tmp_path.glob("*.zip"))
+    assert len(archives) == 1
+    with zipfile.ZipFile(archives[0]) as archive:
+        manifest = [json.loads(line) for line in archive.read("manifest.jsonl").decode("utf-8").splitlines()]
+        assert [item["topic"] for item in manifest] == TOPICS
+        for item in manifest:
+            assert item["file"] in archive.namelist()
+            # Введение и три главы
+            assert len(item["sections"]) == 4
+
+
+def test_batch_worker_does_not_overwrite_existing_files(api_client, tmp_path):
+    existing = tmp_path / f"Реферат - {TOPICS[0]}.docx"
+    existing.write_bytes(b"previous run")
+
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    run_worker(worker)
+
+    assert existing.read_bytes() == b"previous run"
+    assert (tmp_path / f"Реферат - {TOPICS[0]} (2).docx").exists()
+
+
+def test_batch_worker_traces_job_in_span_args(api_client, tmp_path):
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    worker.tracer = tracing.Tracer()
+    worker.trace_name = "job-1"
+    worker.queued_at = 0.0
+    run_worker(worker)
+
+    spans = {event["name"]: event for event in worker.tracer.events if event["ph"] == "X"}
+    assert spans["job"]["args"]["job"] == "job-1"
+    assert spans["queue_wait"]["args"]["job"] == "job-1"
+    assert "batch_wait" in spans
+
+
+def test_batch_worker_defers_topics_over_spend_limit(api_client, tmp_path):
+    topics = TOPICS + ["Квантовая механика"]
+    one_topic = CostPlanner(api_client).estimate_topic(topics[0], 3, 1000, bulk=True).cost
+    api_client.spend_governor = SpendGovernor(limit=one_topic * 1.5)
+
+    worker = BatchGeneratorWorker(topics, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    progress = []
+    worker.progress.connect(progress.append)
+    events = run_worker(worker)
+
+    assert worker.deferred
+    assert events["essays"] == topics[:1]
+    assert events["finished"][0][0] is False
+    # Отложенные темы не считаются сделанными
+    assert worker.topics == topics
+    job = Job(topics, 3, 1000, str(tmp_path), completed_topics=events["essays"])
+    assert job.overall_progress(len(worker.topics), max(progress)) == 33
+    assert job.remaining_topics == topics[1:]
+
+
+@pytest.mark.parametrize("final_status", ["EXPIRED", "FAILED"])
+def test_batch_worker_keeps_partial_results_of_unfinished_batch(mock_server, api_client, tmp_path, final_status):
+    server, _ = mock_server
+    server.batch_final_status = final_status
+    server.batch_drop = 1
+    api_client.spend_governor = SpendGovernor(limit=0)
+
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    events = run_worker(worker)
+
+    assert events["finished"] == [(True, "Рефераты успешно сгенерированы! 🎉")]
+    assert events["essays"] == TOPICS
+    # Потерянные ответы дозапрошены обычными запросами - по одному на каждое из двух заданий
+    assert api_client.take_call_stats()[0] == 2
+
+
+def test_batch_worker_fails_when_batch_returns_nothing(mock_server, api_client, tmp_path):
+    server, _ = mock_server
+    server.batch_final_status = "EXPIRED"
+    server.batch_drop = 100
+
+    worker = BatchGeneratorWorker(TOPICS, 3, 1000, str(tmp_path), "Русский", api_client, poll_interval=0)
+    events = run_worker(worker)
+
+    assert events["finished"][0][0] is False
+    assert events["essays"] == []
@@ -0,0 +1,52 @@
+"""Оценка стоимости и лимит расходов"""
+import threading
+
+import pytest
+
+from controllers.prefetcher import StructurePrefetcher
+from models import APIClient, SpendGovernor
+from utils.mock_server import start_mock_server
+
+# Цена 1 доллар за миллион токенов: 1000 токенов стоят 0.001
+USAGE = {"prompt_tokens": 200, "completion_tokens": 800, "total_tokens": 1000}
+
+
+def test_usage_is_not_counted_twice_with_reservation():
+    governor = SpendGovernor(limit=0.01, price_per_million=1.0)
+    assert governor.try_reserve(0.004)
+    governor.record_usage(USAGE)
+
+    assert governor.spent == pytest.approx(0.001)
+    # Оплаченные 0.001 вычитаются из резерва, а не добавляются к нему
+    assert governor.available() == pytest.approx(0.006)
+
+
+def test_release_frees_only_current_thread_reservation():
+    governor = SpendGovernor(limit=0.01, price_per_million=1.0)
+    other = threading.Thread(target=lambda: governor.try_reserve(0.006))
+    other.start()
+    other.join()
+
+    assert governor.try_reserve(0.004)
+    assert not governor.try_reserve(0.001)
+    governor.release()
+    assert governor.available() == pytest.approx(0.004)
+
+
+@pytest.mark.parametrize("limit, cached", [(1e-9, False), (1.0, True)])
+def test_prefetch_respects_spend_limit(limit, cached):
+    server, api_base = start_mock_server()
+    try:
+        client = APIClient(base_delay=0)
+        client.api_base = api_base
+        client.base_url = f"{api_base}/chat/completions"
+        client.spend_governor = SpendGovernor(limit=limit)
+
+        StructurePrefetcher(client)._prefetch("Фотосинтез", 3, "Русский")
+
+        assert (("Фотосинтез", 3, "Русский") in client._structure_cache) is cached
+        assert (client.spend_governor.spent > 0) is cached
+        assert client.spend_governor.reserved == 0
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,85 @@
+"""Очередь заданий: что и когда сохраняется на диск"""
+import json
+
+from controllers.job_queue import Job, JobQueue, JobStatus
+
+
+def saved_jobs(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {item["id"]: item for item in json.load(f)}
+
+
+def test_progress_is_not_written_on_every_tick(tmp_path):
+    path = tmp_path / "jobs.json"
+    queue = JobQueue(str(path))
+    job = queue.submit(Job(["Тема"] * 2000, 3, 1000, str(tmp_path)))
+
+    for value in range(1, 50):
+        queue.update(job.id, progress=value)
+
+    assert saved_jobs(path)[job.id]["progress"] == 0
+    assert queue.get(job.id).progress == 49
+
+
+def test_progress_is_saved_with_the_next_real_change(tmp_path):
+    path = tmp_path / "jobs.json"
+    queue = JobQueue(str(path))
+    job = queue.submit(Job(["Тема 1", "Тема 2"], 3, 1000, str(tmp_path)))
+
+    queue.update(job.id, progress=40)
+    queue.update(job.id, completed_topics=["Тема 1"])
+
+    saved = saved_jobs(path)[job.id]
+    assert saved["progress"] == 40
+    assert saved["completed_topics"] == ["Тема 1"]
+
+
+def test_running_job_is_restored_paused(tmp_path):
+    path = tmp_path / "jobs.json"
+    job = JobQueue(str(path)).submit(Job(["Тема"], 3, 1000, str(tmp_path), status=JobStatus.RUNNING))
+
+    assert JobQueue(str(path)).get(job.id).status == JobStatus.PAUSED
+
+
+class FakeWorker:
+    def __init__(self):
+        self.calls = []
+
+    def pause(self):
+        self.calls.append("pause")
+
+    def resume(self):
+        self.calls.append("resume")
+
+    def cancel(self):
+        self.calls.append("cancel")
+
+
+def test_status_transitions(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.json"))
+    job = queue.submit(Job(["Тема"], 3, 1000, str(tmp_path)))
+    worker = FakeWorker()
+
+    assert not queue.resume(job.id)
+    assert queue.pause(job.id, worker)
+    assert queue.resume(job.id, worker)
+    assert queue.get(job.id).status == JobStatus.RUNNING
+    assert queue.cancel(job.id, worker)
+    assert not queue.cancel(job.id, worker)
+    assert worker.calls == ["pause", "resume", "cancel"]
+
+    # Сообщение отменённого worker'а не меняет статус
+    queue.finish(job.id, False, "Генерация была отменена пользователем")
+    assert queue.get(job.id).status == JobStatus.CANCELLED
+
+
+def test_finish_maps_worker_result_to_status(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.json"))
+    done, deferred, failed = (queue.submit(Job([f"Тема {i}"], 3, 1000, str(tmp_path))) for i in range(3))
+
+    assert queue.finish(done.id, True, "Готово").status == JobStatus.DONE
+    assert queue.finish(deferred.id, False, "Лимит", deferred=True).status == JobStatus.PAUSED
+    assert queue.finish(failed.id, False, "Ошибка").status == JobStatus.FAILED
+    # Отложенное задание возобновляется через очередь
+    assert queue.resume(deferred.id)
+    assert queue.get(deferred.id).status == JobStatus.PENDING
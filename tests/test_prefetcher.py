@@ -0,0 +1,40 @@
+"""Предзагрузка структур: без лишних оплаченных запросов"""
+import pytest
+
+from controllers.prefetcher import StructurePrefetcher
+from models import APIClient
+from utils.mock_server import start_mock_server
+
+KEY = ("Фотосинтез", 3, "Русский")
+
+
+@pytest.fixture
+def api_client():
+    server, api_base = start_mock_server()
+    client = APIClient(base_delay=0)
+    client.api_base = api_base
+    client.base_url = f"{api_base}/chat/completions"
+    yield client
+    server.shutdown()
+    server.server_close()
+
+
+def test_reset_drops_queued_prefetches(api_client):
+    prefetcher = StructurePrefetcher(api_client)
+    # Поток не запущен - задачи остаются в очереди, как если бы он был занят другой темой
+    prefetcher.tasks.put(KEY)
+    prefetcher.tasks.put(("Другая тема", 3, "Русский"))
+
+    prefetcher.reset({KEY})
+
+    assert prefetcher.tasks.empty()
+
+
+def test_prefetch_skips_structure_already_consumed(api_client):
+    api_client.get_essay_structure(*KEY)
+    api_client.take_call_stats()
+
+    api_client.prefetch_structure(*KEY)
+
+    assert api_client.take_call_stats()[0] == 0
+    assert KEY not in api_client._structure_cache
@@ -0,0 +1,41 @@
+"""Предпросмотр: одновременно генерируемые разделы не путаются"""
+import pytest
+from PySide6.QtWidgets import QApplication
+from views.preview import SectionPreview
+from views.update_buffer import UIUpdateBuffer
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_parallel_sections_keep_their_own_text(app):
+    preview = SectionPreview()
+    buffer = UIUpdateBuffer()
+    buffer.timer.stop()
+    buffer.on("text", preview.append_section)
+
+    # Два воркера пишут разделы вперемешку, кадр за кадром
+    buffer.append_text("Тема 1", "Введение", "раз ")
+    buffer.append_text("Тема 2", "Глава 1", "один ")
+    buffer.flush()
+    buffer.append_text("Тема 1", "Введение", "два")
+    buffer.append_text("Тема 2", "Глава 1", "сбой")
+    buffer.flush()
+    # Ответ второго раздела перезапрошен уже после того, как первый дописал свой текст:
+    # показанный текст второго раздела убирается целиком, текст первого остаётся
+    buffer.append_text("Тема 1", "Введение", " три")
+    buffer.flush()
+    buffer.append_text("Тема 2", "Глава 1", "")
+    buffer.append_text("Тема 2", "Глава 1", "заново")
+    buffer.flush()
+    buffer.append_text("Тема 1", "Введение", " четыре")
+    buffer.flush()
+
+    assert preview.section_text("Тема 1", "Введение") == "раз два три четыре"
+    assert preview.section_text("Тема 2", "Глава 1") == "заново"
+    assert preview.toPlainText() == (
+        "=== Тема 1: Введение ===\nраз два три четыре\n\n"
+        "=== Тема 2: Глава 1 ===\nзаново"
+    )
@@ -0,0 +1,118 @@
+"""Режим сервиса: очередь заданий и HTTP API на локальном стенде"""
+import asyncio
+import json
+from urllib.parse import quote
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import service as service_module
+from controllers.job_queue import Job, JobStatus
+from service import GenerationService, create_app
+from utils.mock_server import start_mock_server
+
+
+@pytest.fixture
+def generation_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(service_module, "DATA_DIR", str(tmp_path))
+    server, api_base = start_mock_server()
+    service = GenerationService(str(tmp_path / "essays"), max_workers=1)
+    service.api_client.api_base = api_base
+    service.api_client.base_url = f"{api_base}/chat/completions"
+    yield service
+    server.shutdown()
+    server.server_close()
+
+
+async def wait_finished(service: GenerationService, timeout: float = 30) -> None:
+    """Ждёт, пока все задания очереди завершатся"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while any(job.status not in JobStatus.FINAL for job in service.queue.jobs()):
+        assert loop.time() < deadline, "задания не завершились вовремя"
+        await asyncio.sleep(0.05)
+
+
+def test_dispatch_respects_max_workers(generation_service):
+    service = generation_service
+
+    async def scenario():
+        for topic in ("Тема 1", "Тема 2", "Тема 3"):
+            service.queue.submit(Job([topic], 3, 1000, service.output_root))
+        service.start()
+
+        running = [job for job in service.queue.jobs() if job.status == JobStatus.RUNNING]
+        assert len(running) == 1
+        assert len(service.workers) == 1
+
+        await wait_finished(service)
+        assert all(job.status == JobStatus.DONE for job in service.queue.jobs())
+
+    asyncio.run(scenario())
+
+
+def test_submit_rejects_non_object_json(generation_service):
+    async def scenario():
+        async with TestClient(TestServer(create_app(generation_service))) as client:
+            response = await client.post("/jobs", json=[1, 2])
+            assert response.status == 400
+            assert "error" in await response.json()
+
+    asyncio.run(scenario())
+
+
+def test_event_history_keeps_only_latest_events(generation_service):
+    service = generation_service
+    for value in range(100):
+        service._publish("job", {"type": "progress", "value": value})
+        service._publish("job", {"type": "essay", "topic": f"Тема {value}"})
+    service._publish("job", {"type": "finished", "success": True, "message": "Готово"})
+
+    assert list(service.events["job"].values()) == [
+        {"type": "progress", "value": 99},
+        {"type": "finished", "success": True, "message": "Готово"},
+    ]
+
+
+async def read_events(response) -> list:
+    """Читает поток text/event-stream до события finished"""
+    events = []
+    async for line in response.content:
+        line = line.decode("utf-8").strip()
+        if line.startswith("data:"):
+            events.append(json.loads(line[len("data:"):]))
+            if events[-1]["type"] == "finished":
+                break
+    return events
+
+
+def test_http_flow_submit_events_download(generation_service):
+    async def scenario():
+        async with TestClient(TestServer(create_app(generation_service))) as client:
+            response = await client.post("/jobs", json={
+                "topics": ["Фотосинтез"],
+                "num_chapters": 3,
+                "symbols_per_chapter": 1000
+            })
+            assert response.status == 201
+            job = await response.json()
+            assert job["estimate"]["requests"] == 5
+
+            response = await client.get(f"/jobs/{job['id']}/events")
+            assert response.headers["Content-Type"].startswith("text/event-stream")
+            events = await read_events(response)
+            assert events[-1]["success"] is True
+            assert events[-1]["status"] == JobStatus.DONE
+            assert {"type": "essay", "topic": "Фотосинтез"} in events
+
+            response = await client.get(f"/jobs/{job['id']}/files")
+            files = await response.json()
+            assert files == ["Реферат - Фотосинтез.docx"]
+
+            response = await client.get(f"/jobs/{job['id']}/files/{quote(files[0])}")
+            assert response.status == 200
+            content = await response.read()
+            # .docx - это ZIP-архив
+            assert content[:2] == b"PK"
+
+    asyncio.run(scenario())